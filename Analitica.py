@@ -0,0 +1,74 @@
+import functools
+import numpy as np
+import pandas as pd
+import streamlit as st
+import Datos
+import Perfil
+
+SEMESTRE = 6                            # Meses del primer semestre, para el avance de ejecución
+
+
+def _dividir(a, b):                     # División elemento a elemento; NaN donde el divisor es 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(b != 0, a / np.where(b != 0, b, 1), np.nan)
+
+
+class IndicadoresGasto:
+    """Indicadores de todos los años y departamentos a la vez, sobre los arreglos de Datos.AlmacenGastos:
+    crecimiento anual, participación nacional, ranking y su cambio, acumulado y avance del primer semestre"""
+
+    def __init__(self, almacen):
+        self.anios = almacen.anios
+        self.departamentos = list(almacen.tabla_anual["Departamento"])
+        n = len(self.departamentos)
+        self.gasto = almacen.anual[:, :n]                           # [año, departamento]
+
+        self.crecimiento = np.full(self.gasto.shape, np.nan)        # Respecto al año anterior; NaN el primer año
+        self.crecimiento[1:] = _dividir(self.gasto[1:], self.gasto[:-1]) - 1
+        self.participacion = _dividir(self.gasto, self.gasto.sum(axis=1, keepdims=True))
+        self.ranking = np.argsort(np.argsort(-self.gasto, axis=1, kind="stable"), axis=1) + 1  # 1 = mayor gasto
+        self.cambio_ranking = np.zeros(self.ranking.shape, dtype=int)   # Positivo: subió puestos
+        self.cambio_ranking[1:] = self.ranking[:-1] - self.ranking[1:]
+        self.acumulado = self.gasto.cumsum(axis=0)
+        self.crecimiento_compuesto = _dividir(self.gasto[-1], self.gasto[0]) ** (1 / max(len(self.anios) - 1, 1)) - 1
+
+        mensual = almacen.mensual[:, :n]                            # [año, departamento, mes]
+        self.avance_semestre = _dividir(mensual[:, :, :SEMESTRE].sum(axis=2), mensual.sum(axis=2))
+
+    @functools.lru_cache(maxsize=None)
+    def tabla_anio(self, anio):
+        """Indicadores de un año por departamento, ordenados por ranking. No modificar el resultado."""
+        i = self.anios.index(anio)
+        tabla = pd.DataFrame({"Departamento": self.departamentos, "Gasto": self.gasto[i],
+                              "Crecimiento (%)": 100 * self.crecimiento[i],
+                              "Participación (%)": 100 * self.participacion[i],
+                              "Ranking": self.ranking[i], "Cambio de ranking": self.cambio_ranking[i],
+                              "Avance 1er semestre (%)": 100 * self.avance_semestre[i]})
+        return tabla.sort_values("Ranking", ignore_index=True)
+
+    @functools.lru_cache(maxsize=None)
+    def tabla_periodo(self):
+        """Acumulado de todo el periodo por departamento, de mayor a menor. No modificar el resultado."""
+        tabla = pd.DataFrame({"Departamento": self.departamentos, "Acumulado": self.acumulado[-1],
+                              "Participación (%)": 100 * _dividir(self.acumulado[-1], self.acumulado[-1].sum()),
+                              "Crecimiento compuesto (%)": 100 * self.crecimiento_compuesto})
+        return tabla.sort_values("Acumulado", ascending=False, ignore_index=True)
+
+    @functools.lru_cache(maxsize=None)
+    def serie(self, indicador):
+        """Anio, Departamento y el indicador (atributo [año, departamento]) en formato largo. No modificar."""
+        valores = getattr(self, indicador)
+        return pd.DataFrame({"Anio": np.repeat(self.anios, len(self.departamentos)),
+                             "Departamento": np.tile(self.departamentos, len(self.anios)),
+                             indicador: valores.ravel()})
+
+
+def cargar():
+    almacen = Datos.almacen()
+    with Perfil.tramo("transformacion", "IndicadoresGasto"):
+        return IndicadoresGasto(almacen)
+
+
+@st.cache_resource                      # Una sola copia por proceso, como Datos.almacen: otros datos, reiniciar
+def indicadores():
+    return cargar()
@@ -0,0 +1,293 @@
+import os
+import io
+import ast
+import sys
+import json
+import time
+import types
+import random
+import tempfile
+import platform
+import argparse
+import resource
+import functools
+import statistics
+import subprocess
+import contextlib
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+import Ingesta
+
+DIRECTORIO = os.path.dirname(os.path.abspath(__file__))
+RUTA_RESULTADOS = "resultados_benchmark.json"
+FILAS_POR_BLOQUE = 200000
+
+DEPARTAMENTOS = ["AMAZONAS", "ANCASH", "APURIMAC", "AREQUIPA", "AYACUCHO", "CAJAMARCA", "CUSCO", "HUANCAVELICA",
+                 "HUANUCO", "ICA", "JUNIN", "LA LIBERTAD", "LAMBAYEQUE", "LIMA", "LORETO", "MADRE DE DIOS",
+                 "MOQUEGUA", "PASCO", "PIURA", "PROVINCIA CONSTITUCIONAL DEL CALLAO", "PUNO", "SAN MARTIN", "TACNA",
+                 "TUMBES", "UCAYALI"]
+
+
+# ----- Generador de archivos sintéticos con el formato del MEF -----
+
+def _bloque_sintetico(filas, anio, rng):
+    """Un bloque de filas con las 63 columnas y tipos de Ingesta.D_TYPES"""
+    datos = {}
+    for i, columna in enumerate(Ingesta.COLUMNAS):
+        tipo = Ingesta.D_TYPES[i]
+        if columna == "ANO_EJE":
+            datos[columna] = np.full(filas, anio, dtype="int16")
+        elif columna == "MES_EJE":
+            datos[columna] = rng.integers(0, 13, filas, dtype="int8")     # 0 = apertura, como en los datos reales
+        elif columna in ("DEPARTAMENTO_EJECUTORA_NOMBRE", "DEPARTAMENTO_META_NOMBRE"):
+            datos[columna] = np.array(DEPARTAMENTOS + [" "])[rng.integers(0, len(DEPARTAMENTOS) + 1, filas)]
+        elif tipo == "str":                                         # Vocabularios pequeños, como los *_NOMBRE
+            datos[columna] = np.array([f"{columna} {k}" for k in range(50)])[rng.integers(0, 50, filas)]
+        elif tipo == "int64":
+            datos[columna] = rng.integers(0, 10 ** 6, filas)
+        else:                                                       # Montos con dos decimales
+            datos[columna] = rng.integers(0, 10 ** 9, filas) / 100
+    for columna in ("MONTO_CERTIFICADO", "MONTO_COMPROMETIDO", "MONTO_DEVENGADO", "MONTO_GIRADO"):
+        datos[columna][datos["MES_EJE"] == 0] = 0                  # La apertura solo tiene PIA y PIM
+    return pd.DataFrame(datos, columns=Ingesta.COLUMNAS)
+
+
+def generar(ruta, filas, anio=2012, semilla=0):
+    """Escribir un <año>-Gastos.csv sintético de filas filas"""
+    rng = np.random.default_rng(semilla)
+    escritas = 0
+    with open(ruta, "w", encoding="utf-8", newline="") as archivo:
+        while escritas < filas:
+            bloque = _bloque_sintetico(min(FILAS_POR_BLOQUE, filas - escritas), anio, rng)
+            bloque.to_csv(archivo, index=False, header=escritas == 0)
+            escritas += len(bloque)
+    return ruta
+
+
+# ----- Agregadores: se miden en un proceso nuevo para obtener su pico de memoria (RSS) -----
+
+def _funcion_de_script(ruta, nombre):
+    """Cargar solo las definiciones de un script de OLD, sin ejecutar su código de nivel superior"""
+    with open(ruta, encoding="utf-8") as archivo:
+        arbol = ast.parse(archivo.read())
+    arbol.body = [nodo for nodo in arbol.body if isinstance(nodo, (ast.Import, ast.ImportFrom, ast.FunctionDef))]
+    espacio = {}
+    exec(compile(arbol, ruta, "exec"), espacio)
+    return espacio[nombre]
+
+
+def _ejecutar_agregador(nombre, entrada, salida):   # Corre en el proceso hijo
+    os.chdir(DIRECTORIO)
+    inicio = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        if nombre == "obtener_gasto_total (OLD)":
+            _funcion_de_script("OLD/obtener_gasto_total.py", "obtener_gasto_total")(entrada, salida)
+        elif nombre == "obtener_gasto_mensual (OLD)":
+            _funcion_de_script("OLD/2-Obtener_gasto_mensual.py", "obtener_gasto_mensual")(entrada, salida)
+        elif nombre in ("Ingesta.agregar_archivo", "Ingesta.agregar_archivo (gzip)"):
+            Ingesta.agregar_archivo(salida if nombre.endswith("(gzip)") else entrada, verbose=False)
+        elif nombre == "Ingesta paralelo":
+            cabecera, rangos = Ingesta.rangos_de_bytes(entrada, os.cpu_count())
+            with ProcessPoolExecutor(os.cpu_count()) as executor:
+                futuros = [executor.submit(Ingesta.agregar_rango, entrada, a, b, cabecera) for a, b in rangos]
+                Ingesta.reducir_parciales([futuro.result() for futuro in futuros])
+        elif nombre == "Columnar.agregar":
+            import Columnar
+            Columnar.agregar(Columnar.abrir(salida))
+    segundos = time.perf_counter() - inicio
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss + resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return segundos, rss * Ingesta.BYTES_MAXRSS
+
+
+AGREGADORES = ["obtener_gasto_total (OLD)", "obtener_gasto_mensual (OLD)", "Ingesta.agregar_archivo",
+               "Ingesta.agregar_archivo (gzip)", "Ingesta paralelo", "Columnar.agregar"]
+
+
+def medir_agregadores(entrada, filas, nombres=AGREGADORES, directorio_temporal=None):
+    directorio_temporal = directorio_temporal or os.path.dirname(os.path.abspath(entrada))
+    resultados = {}
+    for nombre in nombres:
+        salida = os.path.join(directorio_temporal, "benchmark-salida.csv")
+        if nombre == "Columnar.agregar":                            # La conversión no se mide, solo la agregación
+            import Columnar
+            salida = os.path.join(directorio_temporal, "benchmark.col")
+            Columnar.convertir(entrada, salida)
+        elif nombre == "Ingesta.agregar_archivo (gzip)":            # Tampoco se mide la compresión
+            import Comprimido
+            salida = Comprimido.comprimir(entrada, "gzip",
+                                          destino=os.path.join(directorio_temporal, "benchmark.csv.gz"))
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            segundos, rss = executor.submit(_ejecutar_agregador, nombre, os.path.abspath(entrada),
+                                            os.path.abspath(salida)).result()
+        resultados[nombre] = {"segundos": segundos, "filas_por_segundo": filas / segundos, "rss_pico_bytes": rss}
+        print(f"{nombre}: {segundos:.2f} s, {filas / segundos:,.0f} filas/s, {rss / 1024 ** 2:,.0f} MiB")
+    return resultados
+
+
+# ----- Páginas del dashboard con un Streamlit falso -----
+
+class _Contexto:                        # Columnas y contenedores: se usan con "with"
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+
+def _streamlit_falso(elegir):
+    """Módulos streamlit y streamlit_option_menu mínimos; los widgets devuelven elegir(opciones)"""
+    st = types.ModuleType("streamlit")
+    st.cache_resource = lambda funcion: functools.lru_cache(maxsize=None)(funcion)
+    st.cache_data = st.cache_resource
+    st.columns = lambda spec, **kwargs: [_Contexto() for _ in range(spec if isinstance(spec, int) else len(spec))]
+    st.selectbox = lambda etiqueta, opciones, **kwargs: elegir(list(opciones))
+    st.radio = lambda etiqueta, options, **kwargs: elegir(list(options))
+    st.altair_chart = lambda grafico, **kwargs: grafico.to_dict()  # Forzar la serialización a Vega-Lite
+    st.vega_lite_chart = lambda *args, spec=None, **kwargs: json.dumps(spec)
+    for nombre in ("markdown", "warning", "header", "title", "set_page_config", "write", "caption"):
+        setattr(st, nombre, lambda *args, **kwargs: None)
+    st.components = types.SimpleNamespace(v1=types.SimpleNamespace(html=lambda *args, **kwargs: None))
+
+    menu = types.ModuleType("streamlit_option_menu")
+    menu.option_menu = lambda menu_title=None, options=(), **kwargs: elegir(list(options))
+    return st, menu
+
+
+def medir_paginas(repeticiones=20, semilla=0):
+    """Tiempo de cada página con selecciones aleatorias: primera llamada (carga en frío) y mediana del resto"""
+    os.chdir(DIRECTORIO)
+    aleatorio = random.Random(semilla)
+    st, menu = _streamlit_falso(aleatorio.choice)
+    sys.modules["streamlit"], sys.modules["streamlit_option_menu"] = st, menu
+    for modulo in ("Datos", "Graphics", "Map_loader"):              # Reimportar con el Streamlit falso
+        sys.modules.pop(modulo, None)
+    import Graphics
+    import Map_loader
+    import Datos
+    import Cache
+
+    # Cada llamada con una caché de renders vacía (en memoria y en disco): se mide la construcción, no un acierto
+    temporal = tempfile.TemporaryDirectory()
+    Cache.renders = lambda: Cache.CacheRenderizado("benchmark", tempfile.mkdtemp(dir=temporal.name), 0)
+
+    def create_map():
+        return Map_loader.create_map(Map_loader.cargar_geojson(), Datos.almacen().tabla_anual,
+                                     Map_loader.cargar_informacion_regiones())
+
+    paginas = {"Map_loader.create_map": create_map,
+               "Map_loader.render_map": Map_loader.render_map,
+               "Graphics.mostrar_gasto_anual": Graphics.mostrar_gasto_anual,
+               "Graphics.mostrar_gasto_mensual": Graphics.mostrar_gasto_mensual,
+               "Graphics.mostrar_gasto_mensual_region": Graphics.mostrar_gasto_mensual_region}
+
+    resultados = {}
+    for nombre, pagina in paginas.items():
+        tiempos = []
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                pagina()
+            tiempos.append(time.perf_counter() - inicio)
+        resultados[nombre] = {"primera_segundos": tiempos[0], "mediana_segundos": statistics.median(tiempos[1:]),
+                              "repeticiones": repeticiones}
+        print(f"{nombre}: primera {tiempos[0] * 1000:.1f} ms, mediana {statistics.median(tiempos[1:]) * 1000:.2f} ms")
+    temporal.cleanup()
+    return resultados
+
+
+# ----- Arranque en frío: un intérprete nuevo por página -----
+
+PAGINAS = ["Página principal", "Gráficas de Gasto", "Comparativo", "Información"]
+
+_ARRANQUE = """
+import sys, json, time, types
+inicio = time.perf_counter()
+import streamlit
+menu = types.ModuleType("streamlit_option_menu")
+menu.option_menu = lambda menu_title=None, options=(), default_index=0, **kwargs: \\
+    {pagina!r} if {pagina!r} in options else list(options)[default_index]
+sys.modules["streamlit_option_menu"] = menu
+import Dashboard
+importado = time.perf_counter()
+Dashboard.PublicSpendingApp()
+fin = time.perf_counter()
+print(json.dumps({{"importar_segundos": importado - inicio, "pagina_segundos": fin - importado,
+                  "modulos": len(sys.modules)}}))
+"""
+
+
+def medir_arranque(paginas=PAGINAS):
+    """Tiempo hasta dibujar cada página en un proceso nuevo, con Streamlit sin servidor (modo "bare")"""
+    resultados = {}
+    for pagina in paginas:
+        inicio = time.perf_counter()
+        salida = subprocess.run([sys.executable, "-c", _ARRANQUE.format(pagina=pagina)], cwd=DIRECTORIO,
+                                capture_output=True, text=True, check=True).stdout
+        total = time.perf_counter() - inicio
+        resultados[pagina] = {**json.loads(salida.strip().splitlines()[-1]), "proceso_segundos": total}
+        print(f"{pagina}: proceso {total * 1000:.0f} ms, importar {resultados[pagina]['importar_segundos'] * 1000:.0f} ms"
+              f", página {resultados[pagina]['pagina_segundos'] * 1000:.0f} ms, {resultados[pagina]['modulos']} módulos")
+    return resultados
+
+
+# ----- Resultados en JSON, para comparar entre commits -----
+
+def _commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=DIRECTORIO, capture_output=True,
+                              text=True).stdout.strip()
+    except OSError:
+        return None
+
+
+def comparar(anterior, actual, umbral=1.10):
+    """Imprimir las mediciones que empeoraron más del umbral respecto a otro archivo de resultados"""
+    claves = {"agregadores": "segundos", "paginas": "mediana_segundos", "arranque": "proceso_segundos"}
+    regresiones = []
+    for seccion, clave in claves.items():
+        for nombre, medicion in actual.get(seccion, {}).items():
+            previa = anterior.get(seccion, {}).get(nombre)
+            if previa:
+                razon = medicion[clave] / previa[clave]
+                print(f"{nombre}: {razon:.2f}x")
+                if razon > umbral:
+                    regresiones.append(nombre)
+    return regresiones
+
+
+def _argumentos():
+    parser = argparse.ArgumentParser(description="Benchmark de la agregación y de las páginas del dashboard")
+    parser.add_argument("--filas", type=int, default=1000000, help="Filas del archivo sintético")
+    parser.add_argument("--entrada", help="Usar un <año>-Gastos.csv existente en lugar de generar uno")
+    parser.add_argument("--temporal", default="benchmark-tmp", help="Carpeta para los archivos generados")
+    parser.add_argument("--repeticiones", type=int, default=20, help="Repeticiones por página")
+    parser.add_argument("--solo", choices=["agregadores", "paginas", "arranque"], help="Medir solo una parte")
+    parser.add_argument("--salida", default=RUTA_RESULTADOS, help="Archivo JSON de resultados")
+    parser.add_argument("--comparar", help="Resultados anteriores; termina con error si hay regresiones")
+    return parser
+
+
+if __name__ == "__main__":
+    args = _argumentos().parse_args()
+    resultados = {"commit": _commit(), "fecha": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": platform.python_version(),
+                  "pandas": pd.__version__, "cpus": os.cpu_count()}
+
+    if args.solo in (None, "agregadores"):
+        os.makedirs(args.temporal, exist_ok=True)
+        entrada = args.entrada or generar(os.path.join(args.temporal, "2012-Gastos.csv"), args.filas)
+        filas = args.filas if args.entrada is None else sum(1 for _ in open(entrada, "rb")) - 1
+        resultados["filas"] = filas
+        resultados["agregadores"] = medir_agregadores(entrada, filas, directorio_temporal=args.temporal)
+    if args.solo in (None, "arranque"):                             # Antes de importar las páginas en este proceso
+        resultados["arranque"] = medir_arranque()
+    if args.solo in (None, "paginas"):
+        resultados["paginas"] = medir_paginas(args.repeticiones)
+
+    with open(args.salida, "w", encoding="utf-8") as archivo:
+        json.dump(resultados, archivo, indent=2)
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as archivo:
+            if comparar(json.load(archivo), resultados):
+                sys.exit(1)
@@ -0,0 +1,154 @@
+import os
+import re
+import glob
+import json
+import shutil
+import tempfile
+import hashlib
+import argparse
+import functools
+import threading
+import collections
+import streamlit as st
+import Perfil
+
+DIRECTORIO = ".cache-renders"
+MAXIMO_BYTES = 256 * 1024 ** 2          # Tamaño máximo en memoria; en disco no hay límite
+ARCHIVOS_DE_DATOS = ("Gasto-Anual/*.csv", "Gasto-Mensual/*.csv", "Gasto-Cubo/*.csv.gz")
+
+
+ARCHIVOS_DE_CODIGO = ("Graphics.py", "Datos.py", "Cubo.py", "Analitica.py")     # Los que construyen los renders
+FORMATO_VERSION = re.compile(r"[0-9a-f]{16}-[0-9a-f]{16}")   # Nombre de los directorios que crea version_renders
+
+
+def _huella(rutas):
+    huella = hashlib.sha256()
+    for ruta in rutas:
+        huella.update(os.path.basename(ruta).encode("utf-8"))
+        with open(ruta, "rb") as archivo:
+            for bloque in iter(lambda: archivo.read(1024 ** 2), b""):
+                huella.update(bloque)
+    return huella.hexdigest()[:16]
+
+
+@functools.lru_cache(maxsize=None)      # Los datos se cargan una vez por proceso; la huella también
+def version_datos(patrones=ARCHIVOS_DE_DATOS):
+    """Huella del contenido de las tablas que usan las páginas; cambia solo si cambian los datos"""
+    return _huella(sorted(ruta for patron in patrones for ruta in glob.glob(patron)))
+
+
+@functools.lru_cache(maxsize=None)
+def version_codigo(archivos=ARCHIVOS_DE_CODIGO):
+    """Huella del código que construye gráficos y tablas: tras un despliegue no se sirven renders anteriores"""
+    return _huella(os.path.join(os.path.dirname(os.path.abspath(__file__)), archivo) for archivo in archivos)
+
+
+def version_renders():                  # Nombre del directorio en disco: datos y código con que se construyeron
+    return version_datos() + "-" + version_codigo()
+
+
+class CacheRenderizado:
+    """Gráficos (Vega-Lite en JSON) y tablas HTML ya construidos, por página y selección.
+    En memoria con desalojo del menos usado al superar maximo_bytes, y en disco en directorio/<versión>/."""
+
+    def __init__(self, version, directorio=DIRECTORIO, maximo_bytes=MAXIMO_BYTES):
+        self.version = version
+        self.directorio = os.path.join(directorio, version)
+        self.maximo_bytes = maximo_bytes
+        self.bytes = 0
+        self.aciertos = {"memoria": 0, "disco": 0}
+        self.fallos = 0
+        self._entradas = collections.OrderedDict()                  # Clave → {nombre: texto}, del más antiguo
+        self._candado = threading.Lock()                            # Varias sesiones de Streamlit a la vez
+
+    def _ruta(self, clave):
+        return os.path.join(self.directorio, hashlib.sha1(repr(clave).encode("utf-8")).hexdigest() + ".json")
+
+    @staticmethod
+    def _tamano(valor):
+        return sum(len(texto) for texto in valor.values() if texto)
+
+    def _guardar_en_memoria(self, clave, valor):
+        with self._candado:
+            if clave in self._entradas:
+                return
+            self._entradas[clave] = valor
+            self.bytes += self._tamano(valor)
+            while self.bytes > self.maximo_bytes and len(self._entradas) > 1:
+                _, desalojado = self._entradas.popitem(last=False)
+                self.bytes -= self._tamano(desalojado)
+
+    def obtener(self, clave, construir):
+        """Valor de la clave ({nombre: texto}); construir() solo se llama si no está en memoria ni en disco"""
+        with self._candado:
+            if clave in self._entradas:
+                self._entradas.move_to_end(clave)
+                self.aciertos["memoria"] += 1
+                Perfil.contar("cache memoria")
+                return self._entradas[clave]
+
+        ruta = self._ruta(clave)
+        if os.path.exists(ruta):
+            with Perfil.tramo("carga", "cache disco"), open(ruta, encoding="utf-8") as archivo:
+                valor = json.load(archivo)
+            self.aciertos["disco"] += 1
+            Perfil.contar("cache disco")
+        else:
+            valor = construir()
+            self.fallos += 1
+            Perfil.contar("cache fallo")
+            os.makedirs(self.directorio, exist_ok=True)
+            with tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=self.directorio, suffix=".tmp",
+                                             delete=False) as archivo:  # Un temporal por sesión: escritura atómica
+                json.dump(valor, archivo, ensure_ascii=False)
+            os.replace(archivo.name, ruta)
+        self._guardar_en_memoria(clave, valor)
+        return valor
+
+    def limpiar_versiones_anteriores(self):
+        """Borrar del disco lo construido con otros datos o código: solo subdirectorios con nombre de versión,
+        nunca archivos ni otras carpetas (el directorio puede ser cualquiera, incluso la raíz del repositorio)"""
+        padre = os.path.dirname(self.directorio)
+        for nombre in os.listdir(padre) if os.path.isdir(padre) else []:
+            ruta = os.path.join(padre, nombre)
+            if nombre != self.version and FORMATO_VERSION.fullmatch(nombre) and os.path.isdir(ruta) \
+                    and not os.path.islink(ruta):
+                shutil.rmtree(ruta)
+
+
+@st.cache_resource                      # Una sola copia por proceso, compartida entre sesiones
+def renders():
+    return CacheRenderizado(version_renders())
+
+
+def cargar_una_vez():
+    """Fuera de Streamlit (comandos de consola) st.cache_resource no guarda nada: cargar los datos una sola vez"""
+    import Datos
+    import Cubo
+    import Analitica
+
+    Datos.almacen, Cubo.cubo = functools.cache(Datos.cargar), functools.cache(Cubo.cargar)
+    Analitica.indicadores = functools.cache(Analitica.cargar)
+
+
+def _argumentos():
+    parser = argparse.ArgumentParser(description="Caché de gráficos y tablas de las páginas del dashboard")
+    parser.add_argument("--precalcular", action="store_true",
+                        help="Construir todas las combinaciones de página, año, mes y departamento")
+    parser.add_argument("--directorio", default=DIRECTORIO)
+    return parser
+
+
+if __name__ == "__main__":
+    import time
+    import Graphics
+
+    cargar_una_vez()
+    args = _argumentos().parse_args()
+    cache = CacheRenderizado(version_renders(), args.directorio)
+    if args.precalcular:
+        inicio = time.perf_counter()
+        cache.limpiar_versiones_anteriores()
+        cantidad = Graphics.precalcular(cache)
+        print(f"{cantidad} combinaciones en {time.perf_counter() - inicio:.1f} s ({cache.fallos} construidas, "
+              f"{cache.aciertos['disco']} ya estaban en disco) en {cache.directorio}")
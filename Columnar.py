@@ -0,0 +1,200 @@
+import os
+import json
+import argparse
+import numpy as np
+import pandas as pd
+import Ingesta
+import Comprimido
+
+# Columnas que se guardan por defecto; None en convertir() guarda todas las del archivo
+COLUMNAS_CACHE = ["ANO_EJE", "MES_EJE", "NIVEL_GOBIERNO_NOMBRE", "SECTOR_NOMBRE", "PLIEGO_NOMBRE",
+                  "EJECUTORA_NOMBRE", "DEPARTAMENTO_EJECUTORA_NOMBRE", "FUNCION_NOMBRE", "GENERICA_NOMBRE",
+                  "MONTO_PIA", "MONTO_PIM", "MONTO_DEVENGADO"]
+
+TIPOS_FIJOS = {"ANO_EJE": "int16", "MES_EJE": "int8"}
+BLOQUE = 8 * 1024 ** 2                  # Filas por bloque al recorrer las columnas mapeadas en memoria
+
+
+def ruta_cache(anio, directorio="."):
+    return os.path.join(directorio, str(anio) + "-Gastos.col")
+
+
+def tipo_columna(nombre):               # Montos numéricos, año y mes enteros pequeños, el resto categórico
+    if nombre.startswith("MONTO_"):
+        return "float64"
+    return TIPOS_FIJOS.get(nombre, "categoria")
+
+
+class _Diccionario:
+    """Codificación incremental valor → código, estable entre partes del archivo"""
+
+    def __init__(self):
+        self.valores = []
+        self._codigos = {}
+
+    def codificar(self, serie):
+        codigos, unicos = pd.factorize(serie)                       # Códigos locales de la parte
+        traduccion = np.full(len(unicos) + 1, -1, dtype="int32")   # El último elemento traduce el -1 (vacío)
+        for i, valor in enumerate(unicos):                          # Solo se recorren los valores distintos
+            if valor not in self._codigos:
+                self._codigos[valor] = len(self.valores)
+                self.valores.append(valor)
+            traduccion[i] = self._codigos[valor]
+        return traduccion[codigos]
+
+
+def _tipo_codigos(cantidad):            # Entero más pequeño que alcanza para los códigos (-1 = vacío)
+    for tipo in ("int8", "int16"):
+        if cantidad <= np.iinfo(tipo).max:
+            return tipo
+    return "int32"
+
+
+def convertir(entrada, destino, columnas=COLUMNAS_CACHE, chunksize=Ingesta.TAMANO_CHUNK):
+    """Convertir una sola vez <año>-Gastos.csv (o comprimido) en un directorio con una columna binaria por archivo"""
+    with Comprimido.abrir(entrada) as flujo:
+        cabecera = list(pd.read_csv(flujo, nrows=0).columns)
+    columnas = cabecera if columnas is None else [columna for columna in columnas if columna in cabecera]
+    tipos = {columna: tipo_columna(columna) for columna in columnas}
+    lectura = {columna: ("str" if tipo == "categoria" else tipo) for columna, tipo in tipos.items()}
+
+    os.makedirs(destino, exist_ok=True)
+    diccionarios = {columna: _Diccionario() for columna, tipo in tipos.items() if tipo == "categoria"}
+    archivos = {columna: open(os.path.join(destino, columna + ".bin"), "wb") for columna in columnas}
+    filas = 0
+
+    try:
+        with Comprimido.abrir(entrada) as flujo:
+            for chunk in pd.read_csv(flujo, usecols=columnas, dtype=lectura, chunksize=chunksize):
+                for columna in columnas:
+                    if columna in diccionarios:
+                        valores = diccionarios[columna].codificar(chunk[columna])
+                    else:
+                        valores = chunk[columna].to_numpy(dtype=tipos[columna])
+                    archivos[columna].write(valores.tobytes())
+                filas += len(chunk)
+    finally:
+        for archivo in archivos.values():
+            archivo.close()
+
+    esquema = {"filas": filas, "columnas": {}}
+    for columna in columnas:
+        if columna in diccionarios:
+            tipo = _tipo_codigos(len(diccionarios[columna].valores))
+            _compactar(os.path.join(destino, columna + ".bin"), filas, tipo)
+            with open(os.path.join(destino, columna + ".json"), "w", encoding="utf-8") as archivo:
+                json.dump(diccionarios[columna].valores, archivo, ensure_ascii=False)
+            esquema["columnas"][columna] = {"tipo": tipo, "categorica": True}
+        else:
+            esquema["columnas"][columna] = {"tipo": tipos[columna], "categorica": False}
+
+    with open(os.path.join(destino, "esquema.json"), "w", encoding="utf-8") as archivo:
+        json.dump(esquema, archivo, indent=2)
+    return abrir(destino)
+
+
+def _compactar(ruta, filas, tipo):      # Reescribir los códigos int32 con el tipo más pequeño posible
+    if tipo == "int32":
+        return
+    codigos = np.fromfile(ruta, dtype="int32", count=filas)
+    codigos.astype(tipo).tofile(ruta)
+
+
+class TablaColumnar:
+    """Acceso de solo lectura a un año convertido; las columnas se mapean en memoria sin copiarse"""
+
+    def __init__(self, directorio):
+        self.directorio = directorio
+        with open(os.path.join(directorio, "esquema.json"), encoding="utf-8") as archivo:
+            self.esquema = json.load(archivo)
+        self.filas = self.esquema["filas"]
+        self._categorias = {}
+
+    @property
+    def columnas(self):
+        return list(self.esquema["columnas"])
+
+    def columna(self, nombre):          # Valores numéricos o códigos de una columna categórica
+        tipo = self.esquema["columnas"][nombre]["tipo"]
+        if self.filas == 0:
+            return np.empty(0, dtype=tipo)
+        return np.memmap(os.path.join(self.directorio, nombre + ".bin"), dtype=tipo, mode="r", shape=(self.filas,))
+
+    def categorias(self, nombre):       # Valores de una columna categórica, en el orden de sus códigos
+        if nombre not in self._categorias:
+            with open(os.path.join(self.directorio, nombre + ".json"), encoding="utf-8") as archivo:
+                self._categorias[nombre] = np.array(json.load(archivo), dtype=object)
+        return self._categorias[nombre]
+
+    def decodificar(self, nombre, inicio=0, fin=None):
+        """Columna categórica como pd.Categorical, sin volver a crear cadenas por fila"""
+        return pd.Categorical.from_codes(np.asarray(self.columna(nombre)[inicio:fin], dtype="int32"),
+                                         categories=self.categorias(nombre))
+
+
+def abrir(destino):
+    return TablaColumnar(destino)
+
+
+def _sumar_enteros(claves, valores, cantidad):
+    """np.bincount de enteros int64 sin perder exactitud: bincount suma en float64, así que cada valor se
+    separa en 24 bits bajos y el resto, y ninguna de las dos sumas supera 2**53 en un bloque"""
+    altos, bajos = valores >> 24, valores & 0xFFFFFF
+    return ((np.bincount(claves, weights=altos, minlength=cantidad).astype("int64") << 24)
+            + np.bincount(claves, weights=bajos, minlength=cantidad).astype("int64"))
+
+
+def agregar(tabla, columna=Ingesta.COLUMNA_MONTO):
+    """Misma serie (departamento, mes) → céntimos que Ingesta.agregar_archivo, leyendo solo tres columnas.
+    En la misma pasada se acumula aparte el total de cada departamento (se verifica en Ingesta.guardar_anio)."""
+    departamentos = tabla.categorias(Ingesta.COLUMNA_DEPARTAMENTO)
+    meses = 13                                                      # MES_EJE va de 0 a 12
+    suma = np.zeros(len(departamentos) * meses, dtype="int64")
+    conteo = np.zeros(len(departamentos) * meses, dtype="int64")   # Para conservar grupos que suman cero
+    totales = np.zeros(len(departamentos), dtype="int64")
+
+    codigos, mes, monto = (tabla.columna(Ingesta.COLUMNA_DEPARTAMENTO), tabla.columna(Ingesta.COLUMNA_MES),
+                           tabla.columna(columna))
+    for inicio in range(0, tabla.filas, BLOQUE):
+        fin = inicio + BLOQUE
+        bloque_codigos = np.asarray(codigos[inicio:fin], dtype="int64")
+        validos = bloque_codigos >= 0
+        centimos = Ingesta.a_centimos(monto[inicio:fin][validos])
+        claves = bloque_codigos[validos] * meses + mes[inicio:fin][validos]
+        suma += _sumar_enteros(claves, centimos, suma.size)
+        conteo += np.bincount(claves, minlength=conteo.size)
+        totales += _sumar_enteros(bloque_codigos[validos], centimos, totales.size)
+
+    suma = suma.reshape(len(departamentos), meses)
+    fila, mes = np.nonzero(conteo.reshape(len(departamentos), meses))
+    indice = pd.MultiIndex.from_arrays([departamentos[fila].astype(str), mes.astype("int8")],
+                                       names=[Ingesta.COLUMNA_DEPARTAMENTO, Ingesta.COLUMNA_MES])
+    parcial = pd.Series(suma[fila, mes], index=indice, name=columna)
+    presentes = np.unique(fila)                                     # Departamentos con alguna fila
+    return Ingesta.con_totales(parcial, pd.Series(totales[presentes], index=departamentos[presentes])).sort_index()
+
+
+def _argumentos():
+    parser = argparse.ArgumentParser(description="Caché columnar de los archivos <año>-Gastos.csv")
+    parser.add_argument("--desde", type=int, default=min(Ingesta.ANIOS), help="Primer año")
+    parser.add_argument("--hasta", type=int, default=max(Ingesta.ANIOS), help="Último año")
+    parser.add_argument("--entrada", default=".", help="Carpeta con los archivos <año>-Gastos.csv")
+    parser.add_argument("--todas", action="store_true", help="Guardar todas las columnas del archivo")
+    parser.add_argument("--agregar", action="store_true",
+                        help="No convertir: regenerar las salidas anual, mensual y combinada desde la caché")
+    return parser
+
+
+if __name__ == "__main__":
+    args = _argumentos().parse_args()
+    anios = range(args.desde, args.hasta + 1)
+
+    if args.agregar:
+        anuales = {anio: Ingesta.guardar_anio(anio, agregar(abrir(ruta_cache(anio, args.entrada))))
+                   for anio in anios}
+        Ingesta.guardar_combinada(anuales, sorted(set(Ingesta.ANIOS) | set(anuales)))
+    else:
+        for anio in anios:
+            convertir(Ingesta.ruta_entrada(anio, args.entrada), ruta_cache(anio, args.entrada),
+                      None if args.todas else COLUMNAS_CACHE)
+            print("Archivo " + Ingesta.ruta_entrada(anio, args.entrada) + " convertido exitosamente.")
@@ -0,0 +1,277 @@
+import io
+import os
+import gzip
+import json
+import queue
+import shutil
+import zipfile
+import argparse
+import threading
+import contextlib
+import subprocess
+
+try:
+    import zstandard
+except ImportError:                     # Opcional: sin el módulo se usa el programa zstd, si está instalado
+    zstandard = None
+
+EXTENSIONES = {".gz": "gzip", ".zst": "zstd", ".zip": "zip"}
+EXTENSION = {tipo: extension for extension, tipo in EXTENSIONES.items()}
+BLOQUE = 4 * 1024 ** 2                  # Bytes descomprimidos por lectura del hilo
+EN_COLA = 8                             # Bloques en espera entre el hilo y el lector (a lo sumo ~32 MiB)
+NIVEL = {"gzip": 6, "zstd": 3, "zip": 6}
+
+
+def formato(entrada):                   # "gzip", "zstd", "zip" o None según la extensión; None para objetos
+    if not isinstance(entrada, (str, os.PathLike)):
+        return None
+    return EXTENSIONES.get(os.path.splitext(entrada)[1].lower())
+
+
+def _programa_zstd():
+    if shutil.which("zstd") is None:
+        raise RuntimeError("Para archivos .zst se necesita el módulo zstandard o el programa zstd")
+    return "zstd"
+
+
+@contextlib.contextmanager
+def _programa(argumentos, **opciones):
+    """Popen que, al terminar bien el bloque, espera al programa y lanza un error si no salió con código 0:
+    un .zst truncado o dañado no debe leerse como un CSV más corto"""
+    with subprocess.Popen(argumentos, **opciones) as proceso:
+        yield proceso
+    if proceso.returncode:
+        raise RuntimeError(f"{' '.join(argumentos)} terminó con código {proceso.returncode}")
+
+
+def _abrir_lectura(ruta, tipo, pila):
+    """Objeto de archivo que entrega los bytes descomprimidos; lo que haya que cerrar queda en la pila"""
+    if tipo == "gzip":
+        return pila.enter_context(gzip.open(ruta, "rb"))
+    if tipo == "zip":                                               # El primer .csv del zip
+        contenedor = pila.enter_context(zipfile.ZipFile(ruta))
+        nombre = next(nombre for nombre in contenedor.namelist() if nombre.lower().endswith(".csv"))
+        return pila.enter_context(contenedor.open(nombre))
+    if zstandard is not None:
+        return pila.enter_context(zstandard.ZstdDecompressor().stream_reader(open(ruta, "rb"), closefd=True,
+                                                                             read_across_frames=True))
+    proceso = pila.enter_context(_programa([_programa_zstd(), "-dcq", ruta], stdout=subprocess.PIPE))
+    return proceso.stdout                                           # Descompresión en otro proceso
+
+
+class LectorEnHilo(io.RawIOBase):
+    """Lectura de un archivo comprimido: un hilo descomprime por bloques mientras el lector (pandas)
+    procesa los anteriores. zlib y zstd liberan el GIL, así que ambos trabajos se superponen."""
+
+    def __init__(self, ruta, tipo, bloque=BLOQUE, en_cola=EN_COLA):
+        super().__init__()
+        self._cola = queue.Queue(en_cola)
+        self._pendiente = memoryview(b"")
+        self._terminado = False
+        self._detener = threading.Event()
+        self._hilo = threading.Thread(target=self._descomprimir, args=(ruta, tipo, bloque), daemon=True)
+        self._hilo.start()
+
+    def _descomprimir(self, ruta, tipo, bloque):
+        try:
+            with contextlib.ExitStack() as pila:
+                origen = _abrir_lectura(ruta, tipo, pila)
+                for datos in iter(lambda: origen.read(bloque), b""):
+                    if self._detener.is_set():
+                        return
+                    self._poner(datos)
+            self._poner(b"")                                        # El final, solo si el origen cerró sin error
+        except Exception as error:                                  # Se vuelve a lanzar en el lector
+            self._poner(error)
+
+    def _poner(self, elemento):         # Esperar lugar en la cola, salvo que el lector ya se haya cerrado
+        while not self._detener.is_set():
+            try:
+                self._cola.put(elemento, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self._pendiente:
+            if self._terminado:
+                return 0
+            elemento = self._cola.get()
+            if isinstance(elemento, Exception):
+                raise elemento
+            if not elemento:
+                self._terminado = True
+                return 0
+            self._pendiente = memoryview(elemento)
+
+        n = min(len(buffer), len(self._pendiente))
+        buffer[:n] = self._pendiente[:n]
+        self._pendiente = self._pendiente[n:]
+        return n
+
+    def close(self):
+        self._detener.set()
+        self._hilo.join()
+        super().close()
+
+
+def abrir(entrada):
+    """Flujo binario de un archivo crudo (.csv, .csv.gz, .csv.zst o .csv.zip) para pasar a pd.read_csv.
+    Los objetos de archivo se devuelven tal cual (sin cerrarlos al salir del with)."""
+    if not isinstance(entrada, (str, os.PathLike)):
+        return contextlib.nullcontext(entrada)
+    tipo = formato(entrada)
+    if tipo is None:
+        return open(entrada, "rb")
+    return io.BufferedReader(LectorEnHilo(entrada, tipo), BLOQUE)
+
+
+class CompresorEnHilo:
+    """Consumidor de bytes (como los de Descarga.descargar) que los escribe comprimidos desde otro hilo.
+    El archivo aparece en destino solo al llamar a cerrar(); mientras tanto se escribe en destino.tmp.
+    Con continuar=True se sigue un destino.tmp interrumpido: gzip y zstd admiten varios miembros o frames
+    seguidos, así que lo nuevo se agrega al final (zip no: vuelve a empezar). bytes es la cantidad de bytes
+    sin comprimir que ya contiene."""
+
+    def __init__(self, destino, tipo=None, nivel=None, continuar=False):
+        self.destino = destino
+        self.tipo = tipo or formato(destino)
+        self.nivel = nivel or NIVEL[self.tipo]
+        self.bytes = 0
+        self._cola = queue.Queue(EN_COLA)
+        self._error = None
+        self._hilo = None                                           # Se inicia con los primeros bytes
+        self._agregar = False                                       # Abrir destino.tmp para agregar al final
+        if continuar and self.tipo != "zip":
+            self._retomar()
+        else:
+            self.descartar()
+
+    @property
+    def temporal(self):
+        return self.destino + ".tmp"
+
+    @property
+    def _punto(self):                   # Punto de control: bytes sin comprimir y tamaño comprimido válidos
+        return self.temporal + ".json"
+
+    def _retomar(self):                 # Sin punto de control, o con un .tmp más corto, se empieza de nuevo
+        try:
+            with open(self._punto, encoding="utf-8") as archivo:
+                punto = json.load(archivo)
+            if os.path.getsize(self.temporal) < punto["tamano"]:
+                raise ValueError(self.temporal)
+        except (OSError, ValueError, KeyError):
+            self.descartar()
+            return
+        with open(self.temporal, "r+b") as archivo:                # Quitar un miembro a medias, si lo hay
+            archivo.truncate(punto["tamano"])
+        self.bytes, self._agregar = punto["bytes"], True
+
+    def previo(self, bloque=BLOQUE):
+        """Bytes sin comprimir ya guardados en destino.tmp; antes de agregar nada nuevo"""
+        if not self.bytes:
+            return
+        with contextlib.ExitStack() as pila:
+            origen = _abrir_lectura(self.temporal, self.tipo, pila)
+            yield from iter(lambda: origen.read(bloque), b"")
+
+    def _abrir_escritura(self, ruta, nivel, pila):
+        modo = "ab" if self._agregar else "wb"
+        if self.tipo == "gzip":
+            return pila.enter_context(gzip.open(ruta, modo, compresslevel=nivel))
+        if self.tipo == "zip":                                      # Un solo miembro con el nombre del .csv
+            contenedor = pila.enter_context(zipfile.ZipFile(ruta, "w", zipfile.ZIP_DEFLATED, compresslevel=nivel))
+            nombre = os.path.basename(os.path.splitext(self.destino)[0])
+            return pila.enter_context(contenedor.open(nombre, "w", force_zip64=True))
+        if zstandard is not None:
+            return pila.enter_context(zstandard.ZstdCompressor(level=nivel).stream_writer(open(ruta, modo),
+                                                                                         closefd=True))
+        salida = pila.enter_context(open(ruta, modo))
+        proceso = pila.enter_context(_programa([_programa_zstd(), "-q", "-c", f"-{nivel}"], stdin=subprocess.PIPE,
+                                               stdout=salida))
+        return pila.enter_context(proceso.stdin)                    # Se cierra antes de esperar al proceso
+
+    def _comprimir(self, nivel):
+        recibido = False                                            # Ya llegó el None de cerrar()
+        try:
+            with contextlib.ExitStack() as pila:
+                destino = self._abrir_escritura(self.temporal, nivel, pila)
+                for datos in iter(self._cola.get, None):
+                    destino.write(datos)
+                recibido = True
+        except Exception as error:                                  # También al cerrar: zstd con código distinto de 0
+            self._error = error
+            if not recibido:
+                for _ in iter(self._cola.get, None):               # Vaciar la cola para no bloquear al productor
+                    pass
+
+    def _iniciar(self):
+        if self._hilo is None:
+            self._hilo = threading.Thread(target=self._comprimir, args=(self.nivel,), daemon=True)
+            self._hilo.start()
+
+    def __call__(self, datos):
+        self._iniciar()
+        self._cola.put(bytes(datos))
+        self.bytes += len(datos)
+
+    def _terminar(self):                # Cerrar el miembro o frame en curso; relanzar un error del hilo
+        self._iniciar()
+        self._cola.put(None)
+        self._hilo.join()
+        self._hilo, self._agregar = None, True
+        if self._error is not None:
+            error, self._error = self._error, None
+            self.descartar()
+            raise error
+
+    def interrumpir(self):
+        """Dejar destino.tmp válido y guardar el punto de control, para seguir con continuar=True"""
+        self._terminar()
+        with open(self._punto, "w", encoding="utf-8") as archivo:
+            json.dump({"bytes": self.bytes, "tamano": os.path.getsize(self.temporal)}, archivo)
+
+    def descartar(self):                # Empezar de cero: borrar destino.tmp y su punto de control
+        for ruta in (self.temporal, self._punto):
+            if os.path.exists(ruta):
+                os.remove(ruta)
+        self.bytes, self._agregar = 0, False
+
+    def cerrar(self):
+        self._terminar()
+        os.replace(self.temporal, self.destino)
+        if os.path.exists(self._punto):
+            os.remove(self._punto)
+        return self.destino
+
+
+def comprimir(entrada, tipo="zstd", borrar=False, destino=None):
+    """Comprimir un archivo crudo existente (lectura y compresión superpuestas); devuelve la ruta nueva,
+    por defecto la de la entrada con la extensión del formato"""
+    compresor = CompresorEnHilo(destino or entrada + EXTENSION[tipo], tipo)
+    with open(entrada, "rb") as archivo:
+        for datos in iter(lambda: archivo.read(BLOQUE), b""):
+            compresor(datos)
+    destino = compresor.cerrar()
+    if borrar:
+        os.remove(entrada)
+    return destino
+
+
+def _argumentos():
+    parser = argparse.ArgumentParser(description="Comprimir los archivos <año>-Gastos.csv ya descargados")
+    parser.add_argument("archivos", nargs="+", help="Archivos .csv a comprimir")
+    parser.add_argument("--formato", choices=["gzip", "zstd", "zip"], default="zstd")
+    parser.add_argument("--borrar", action="store_true", help="Borrar el .csv original al terminar")
+    return parser
+
+
+if __name__ == "__main__":
+    args = _argumentos().parse_args()
+    for ruta in args.archivos:
+        destino = comprimir(ruta, args.formato, args.borrar)
+        print(f"{ruta} → {destino}: {os.path.getsize(destino) / 1024 ** 2:,.0f} MiB")
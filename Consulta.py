@@ -0,0 +1,246 @@
+import os
+import argparse
+import numpy as np
+import pandas as pd
+import Ingesta
+import Columnar
+
+FILAS_POR_BLOQUE = 16384                # Filas por zona (mínimo y máximo de cada columna); divide a Columnar.BLOQUE
+COLUMNA_CANTIDAD = Ingesta.COLUMNA_CANTIDAD
+ORDEN = [Ingesta.COLUMNA_DEPARTAMENTO, Ingesta.COLUMNA_MES]
+
+
+def ruta_indice(tabla):
+    return os.path.join(tabla.directorio, "indice.npz")
+
+
+def _montos(medidas):                   # Medidas que se suman como céntimos int64 (ver Ingesta.a_centimos)
+    return [medida for medida in medidas if medida.startswith("MONTO_")]
+
+
+def _a_soles(resultado, medidas):       # Céntimos → soles, solo en la salida
+    return resultado.assign(**{medida: Ingesta.a_soles(resultado[medida]) for medida in _montos(medidas)})
+
+
+def _zonas(valores, filas_por_bloque):  # Mínimo y máximo por bloque, ignorando NaN en los montos
+    minimos, maximos = [], []
+    for inicio in range(0, len(valores), Columnar.BLOQUE):
+        parte = np.asarray(valores[inicio:inicio + Columnar.BLOQUE])
+        cortes = np.arange(0, len(parte), filas_por_bloque)
+        minimos.append(np.fmin.reduceat(parte, cortes))
+        maximos.append(np.fmax.reduceat(parte, cortes))
+    return np.concatenate(minimos), np.concatenate(maximos)
+
+
+def _tramos(codigos):
+    """Tramos consecutivos de filas con el mismo código: (código, inicio, fin) ordenados por código"""
+    inicios, valores = [], []
+    for inicio in range(0, len(codigos), Columnar.BLOQUE):
+        parte = np.asarray(codigos[inicio:inicio + Columnar.BLOQUE])
+        cambios = np.concatenate([[0], np.flatnonzero(parte[1:] != parte[:-1]) + 1])
+        inicios.append(cambios + inicio)
+        valores.append(parte[cambios])
+    inicios, valores = np.concatenate(inicios), np.concatenate(valores).astype("int32")
+    nuevos = np.concatenate([[True], valores[1:] != valores[:-1]])  # Unir tramos cortados entre partes
+    inicios, valores = inicios[nuevos], valores[nuevos]
+    fines = np.append(inicios[1:], len(codigos))
+
+    orden = np.argsort(valores, kind="stable")
+    return valores[orden], inicios[orden], fines[orden]
+
+
+def indexar(tabla, filas_por_bloque=FILAS_POR_BLOQUE):
+    """Zonas mínimo/máximo por bloque de cada columna y tramos de filas por departamento, en indice.npz"""
+    arreglos = {"filas": np.array(tabla.filas), "filas_por_bloque": np.array(filas_por_bloque)}
+    if tabla.filas:
+        for columna in tabla.columnas:
+            arreglos["min_" + columna], arreglos["max_" + columna] = _zonas(tabla.columna(columna),
+                                                                            filas_por_bloque)
+        arreglos["tramo_codigo"], arreglos["tramo_inicio"], arreglos["tramo_fin"] = \
+            _tramos(tabla.columna(Ingesta.COLUMNA_DEPARTAMENTO))
+    np.savez(ruta_indice(tabla), **arreglos)
+    return Indice(arreglos)
+
+
+class Indice:
+    def __init__(self, arreglos):
+        self.arreglos = dict(arreglos)
+        self.filas = int(self.arreglos["filas"])
+        self.filas_por_bloque = int(self.arreglos["filas_por_bloque"])
+
+    def zonas(self, columna):
+        return self.arreglos["min_" + columna], self.arreglos["max_" + columna]
+
+    def tramos(self, codigos):          # Rangos de filas [inicio, fin) de los departamentos pedidos, en orden
+        tramo = self.arreglos["tramo_codigo"]
+        desde, hasta = np.searchsorted(tramo, codigos, "left"), np.searchsorted(tramo, codigos, "right")
+        posiciones = np.concatenate([np.arange(a, b) for a, b in zip(desde, hasta)] + [np.empty(0, dtype=int)])
+        rangos = np.column_stack([self.arreglos["tramo_inicio"][posiciones], self.arreglos["tramo_fin"][posiciones]])
+        return rangos[np.argsort(rangos[:, 0], kind="stable")]
+
+
+def _filas(rangos):                     # Índices de todas las filas de una lista de rangos, sin bucles
+    largos = rangos[:, 1] - rangos[:, 0]
+    desplazamiento = np.repeat(rangos[:, 0] - np.cumsum(largos) + largos, largos)
+    return desplazamiento + np.arange(largos.sum())
+
+
+def _partir(rangos, filas_por_bloque):
+    """Cortar los rangos en los límites de bloque: cada pedazo pertenece a un solo bloque"""
+    primero, ultimo = rangos[:, 0] // filas_por_bloque, (rangos[:, 1] - 1) // filas_por_bloque
+    repeticiones = ultimo - primero + 1
+    rangos = np.repeat(rangos, repeticiones, axis=0)
+    bloque = np.repeat(primero, repeticiones) + np.arange(repeticiones.sum()) - \
+        np.repeat(np.cumsum(repeticiones) - repeticiones, repeticiones)
+    return np.column_stack([np.maximum(rangos[:, 0], bloque * filas_por_bloque),
+                            np.minimum(rangos[:, 1], (bloque + 1) * filas_por_bloque)])
+
+
+def _lotes(pedazos, filas=Columnar.BLOQUE):  # Grupos de pedazos consecutivos con a lo sumo ~filas filas
+    acumulado = np.cumsum(pedazos[:, 1] - pedazos[:, 0])
+    cortes = np.searchsorted(acumulado, np.arange(filas, acumulado[-1] if len(acumulado) else 0, filas), "right")
+    return np.split(pedazos, cortes)
+
+
+class ConsultaColumnar:
+    """Filtrar, agrupar y sumar sobre un año de la caché columnar leyendo solo los bloques necesarios"""
+
+    def __init__(self, tabla, indice):
+        self.tabla = tabla
+        self.indice = indice
+        self.filas_leidas = 0                                       # Filas leídas en la última consulta
+        self._codigos = {}
+
+    def codigos(self, columna, valores):  # Valores de un filtro como códigos o números de la columna
+        if not self.tabla.esquema["columnas"][columna]["categorica"]:
+            return np.asarray(valores, dtype=self.tabla.esquema["columnas"][columna]["tipo"])
+        if columna not in self._codigos:
+            self._codigos[columna] = {valor: i for i, valor in enumerate(self.tabla.categorias(columna))}
+        return np.array([self._codigos[columna][valor] for valor in valores if valor in self._codigos[columna]],
+                        dtype="int32")
+
+    def rangos(self, filtros):
+        """Pedazos de filas que pueden cumplir los filtros: tramos del departamento y zonas mínimo/máximo"""
+        if not self.tabla.filas:
+            return np.empty((0, 2), dtype="int64")
+        if Ingesta.COLUMNA_DEPARTAMENTO in filtros:
+            rangos = self.indice.tramos(filtros[Ingesta.COLUMNA_DEPARTAMENTO])
+        else:
+            rangos = np.array([[0, self.tabla.filas]], dtype="int64")
+        pedazos = _partir(rangos, self.indice.filas_por_bloque)
+        bloque = pedazos[:, 0] // self.indice.filas_por_bloque
+        conservar = np.ones(len(pedazos), dtype=bool)
+        for columna, valores in filtros.items():
+            minimo, maximo = self.indice.zonas(columna)
+            conservar &= ((valores[:, None] >= minimo[bloque]) & (valores[:, None] <= maximo[bloque])).any(axis=0)
+        return pedazos[conservar]
+
+    def consultar(self, filtros=None, por=(), medidas=(Ingesta.COLUMNA_MONTO,), centimos=False):
+        """Sumar medidas (y contar filas) agrupando por "por"; filtros: {columna: valor o lista de valores}.
+        Los montos se suman como céntimos exactos; con centimos=True se devuelven así, sin pasar a soles."""
+        filtros = {columna: self.codigos(columna, valor if isinstance(valor, (list, tuple, set)) else [valor])
+                   for columna, valor in (filtros or {}).items()}
+        por, medidas = list(por), list(medidas)
+        montos = _montos(medidas)
+        pedazos = self.rangos(filtros) if all(len(valores) for valores in filtros.values()) else \
+            np.empty((0, 2), dtype="int64")
+
+        columnas = {columna: self.tabla.columna(columna) for columna in set(filtros) | set(por) | set(medidas)}
+        parciales = []
+        self.filas_leidas = 0
+        for lote in _lotes(pedazos):
+            filas = _filas(lote)
+            self.filas_leidas += len(filas)
+            seleccion = np.ones(len(filas), dtype=bool)
+            for columna, valores in filtros.items():
+                seleccion &= np.isin(columnas[columna][filas], valores)
+            filas = filas[seleccion]
+            datos = pd.DataFrame({columna: columnas[columna][filas] for columna in por + medidas})
+            for columna in montos:
+                datos[columna] = Ingesta.a_centimos(datos[columna])
+            datos[COLUMNA_CANTIDAD] = 1
+            parciales.append(datos.groupby(por, sort=False).sum() if por else datos.sum().to_frame().T)
+
+        if not parciales:
+            return pd.DataFrame(columns=por + medidas + [COLUMNA_CANTIDAD])
+        resultado = pd.concat(parciales)
+        resultado = (resultado.groupby(level=por).sum() if por else resultado.sum().to_frame().T).reset_index(
+            drop=not por)
+        for columna in por:                                         # Códigos a etiquetas
+            if self.tabla.esquema["columnas"][columna]["categorica"]:
+                resultado[columna] = np.append(self.tabla.categorias(columna), None)[resultado[columna]]
+        resultado[COLUMNA_CANTIDAD] = resultado[COLUMNA_CANTIDAD].astype("int64")
+        resultado = resultado[por + medidas + [COLUMNA_CANTIDAD]]
+        return resultado if centimos else _a_soles(resultado, medidas)
+
+
+def ordenar(tabla, claves=ORDEN):
+    """Reescribir las columnas ordenadas por departamento y mes: cada departamento queda en un solo tramo
+    y las zonas del mes descartan casi todos los bloques. Se hace una vez, después de Columnar.convertir."""
+    orden = np.lexsort([np.asarray(tabla.columna(clave)) for clave in reversed(claves)])
+    for columna in tabla.columnas:                                  # Una columna a la vez en memoria
+        ruta = os.path.join(tabla.directorio, columna + ".bin")
+        np.asarray(tabla.columna(columna))[orden].tofile(ruta + ".tmp")
+        os.replace(ruta + ".tmp", ruta)
+    if os.path.exists(ruta_indice(tabla)):
+        os.remove(ruta_indice(tabla))
+    return Columnar.abrir(tabla.directorio)
+
+
+def abrir(anio, directorio="."):
+    """Consulta sobre <año>-Gastos.col; el índice se construye la primera vez y se guarda junto a la caché"""
+    tabla = Columnar.abrir(Columnar.ruta_cache(anio, directorio))
+    ruta = ruta_indice(tabla)
+    if os.path.exists(ruta) and os.path.getmtime(ruta) >= os.path.getmtime(
+            os.path.join(tabla.directorio, "esquema.json")):
+        with np.load(ruta) as arreglos:
+            indice = Indice(arreglos)
+        if indice.filas == tabla.filas:
+            return ConsultaColumnar(tabla, indice)
+    return ConsultaColumnar(tabla, indexar(tabla))
+
+
+def consultar(anios, filtros=None, por=(), medidas=(Ingesta.COLUMNA_MONTO,), directorio="."):
+    """Misma consulta sobre varios años; agrega la columna ANO_EJE si se agrupa por ella"""
+    resultados = [abrir(anio, directorio).consultar(filtros, por, medidas, centimos=True) for anio in anios]
+    resultado = pd.concat(resultados, ignore_index=True)
+    if por:
+        resultado = resultado.groupby(list(por), sort=True).sum().reset_index()
+    else:
+        resultado = resultado.sum().to_frame().T
+    return _a_soles(resultado, medidas)
+
+
+def _filtro(texto):                     # COLUMNA=valor[,valor...]; los valores numéricos se convierten
+    columna, valores = texto.split("=", 1)
+    valores = valores.split(",")
+    if Columnar.tipo_columna(columna) != "categoria":
+        valores = [float(valor) if columna.startswith("MONTO_") else int(valor) for valor in valores]
+    return columna, valores
+
+
+def _argumentos():
+    parser = argparse.ArgumentParser(description="Consultas de filtro, agrupación y suma sobre la caché columnar")
+    parser.add_argument("--desde", type=int, default=min(Ingesta.ANIOS), help="Primer año")
+    parser.add_argument("--hasta", type=int, default=max(Ingesta.ANIOS), help="Último año")
+    parser.add_argument("--entrada", default=".", help="Carpeta con los directorios <año>-Gastos.col")
+    parser.add_argument("--filtro", action="append", type=_filtro, default=[],
+                        help="COLUMNA=valor[,valor...], se puede repetir")
+    parser.add_argument("--por", action="append", default=[], help="Columna de agrupación, se puede repetir")
+    parser.add_argument("--medida", action="append", help="Columna a sumar (por defecto MONTO_DEVENGADO)")
+    parser.add_argument("--ordenar", action="store_true",
+                        help="No consultar: ordenar la caché por departamento y mes y reconstruir el índice")
+    return parser
+
+
+if __name__ == "__main__":
+    args = _argumentos().parse_args()
+    anios = range(args.desde, args.hasta + 1)
+
+    if args.ordenar:
+        for anio in anios:
+            indexar(ordenar(Columnar.abrir(Columnar.ruta_cache(anio, args.entrada))))
+            print("Caché " + Columnar.ruta_cache(anio, args.entrada) + " ordenada e indexada.")
+    else:
+        print(consultar(anios, dict(args.filtro), args.por, args.medida or [Ingesta.COLUMNA_MONTO],
+                        args.entrada).to_string(index=False))
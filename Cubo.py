@@ -0,0 +1,76 @@
+import os
+import glob
+import itertools
+import pandas as pd
+import streamlit as st
+import Ingesta
+import Perfil
+
+DIMENSIONES = ["Anio", "Departamento", "Mes"] + Ingesta.DIMENSIONES_CUBO
+MEDIDAS = Ingesta.MEDIDAS_CUBO + [Ingesta.COLUMNA_CANTIDAD]
+
+
+class CuboGastos:
+    """Cubo año × departamento × mes × nivel × sector × función con sumas y cantidades.
+    Cada combinación de dimensiones (rollup) se calcula una vez y se reutiliza en las consultas.
+    Los montos se guardan y suman como céntimos int64; consultar los devuelve en soles."""
+
+    def __init__(self, tabla):
+        self.tabla = tabla
+        self._rollups = {}
+
+    def rollup(self, dimensiones):
+        """Totales agrupados por un subconjunto de DIMENSIONES (en cualquier orden)"""
+        clave = tuple(sorted(dimensiones, key=DIMENSIONES.index))
+        if clave not in self._rollups:
+            if clave:
+                self._rollups[clave] = self.tabla.groupby(list(clave), observed=True)[MEDIDAS].sum().reset_index()
+            else:
+                self._rollups[clave] = self.tabla[MEDIDAS].sum().to_frame().T
+        return self._rollups[clave]
+
+    def precalcular(self, maximo=2):    # Rollups de hasta "maximo" dimensiones, para responder sin agrupar
+        for cantidad in range(maximo + 1):
+            for dimensiones in itertools.combinations(DIMENSIONES, cantidad):
+                self.rollup(dimensiones)
+
+    def consultar(self, por=(), filtros=None, medidas=MEDIDAS):
+        """Sumar medidas agrupando por "por" y filtrando con {dimensión: valor o lista de valores}"""
+        filtros = filtros or {}
+        tabla = self.rollup(set(por) | set(filtros))
+        for dimension, valor in filtros.items():
+            valores = valor if isinstance(valor, (list, tuple, set)) else [valor]
+            tabla = tabla[tabla[dimension].isin(valores)]
+        if set(filtros) - set(por):                                 # Volver a agrupar sin las columnas filtradas
+            tabla = tabla.groupby(list(por), observed=True)[list(medidas)].sum().reset_index() if por else \
+                tabla[list(medidas)].sum().to_frame().T
+        tabla = tabla[list(por) + list(medidas)].reset_index(drop=True)
+        return tabla.assign(**{medida: Ingesta.a_soles(tabla[medida]) for medida in medidas
+                               if medida in Ingesta.MEDIDAS_CUBO})
+
+
+def cargar(directorio=Ingesta.DIRECTORIO_CUBO):
+    """Unir los cubos anuales generados con Ingesta.py --cubo; None si todavía no existen"""
+    tablas = []
+    with Perfil.tramo("carga", "Cubo.cargar"):
+        for ruta in sorted(glob.glob(os.path.join(directorio, "*-Cubo.csv.gz"))):
+            anio = int(os.path.basename(ruta).split("-")[0])
+            tablas.append(pd.read_csv(ruta, dtype={dimension: "category" for dimension in Ingesta.DIMENSIONES_CUBO})
+                          .assign(Anio=anio))
+    if not tablas:
+        return None
+
+    with Perfil.tramo("transformacion", "CuboGastos"):
+        tabla = pd.concat(tablas, ignore_index=True)
+        for dimension in ["Departamento"] + Ingesta.DIMENSIONES_CUBO:   # Categorías comunes a todos los años
+            tabla[dimension] = tabla[dimension].astype("category")
+        for medida in Ingesta.MEDIDAS_CUBO:                         # Soles del CSV → céntimos exactos
+            tabla[medida] = Ingesta.a_centimos(tabla[medida])
+        cubo = CuboGastos(tabla[DIMENSIONES + MEDIDAS])
+        cubo.precalcular()
+    return cubo
+
+
+@st.cache_resource                      # Una sola copia por proceso, compartida entre sesiones
+def cubo():
+    return cargar()
@@ -1,22 +1,26 @@
 import streamlit as st
 from streamlit_option_menu import option_menu
-import Graphics
-import Map_loader
+import Perfil
+# Graphics y Map_loader (folium, altair, pandas y los datos) se importan al elegir su página por primera vez
 
 
-def colocar_css(nombre):                        # Leer archivo css
-    file = open(nombre, "r", encoding="utf-8")  # Abrir con encodificación utf-8
-    lines = ""
-    for line in file:                           # Copiar las líneas
-        lines = lines + line
-    st.markdown(lines, unsafe_allow_html=True)  # Colocar las líneas como css
-    file.close()                                # Cerrar archivo
+@st.cache_resource                              # Se lee una sola vez por proceso
+def leer_archivo(nombre):
+    with Perfil.tramo("carga", nombre), open(nombre, "r", encoding="utf-8") as file:  # Abrir con encodificación utf-8
+        return file.read()
+
+
+def colocar_css(nombre):                        # Colocar el contenido del archivo css
+    contenido = leer_archivo(nombre)
+    Perfil.carga_util(nombre, contenido)
+    st.markdown(contenido, unsafe_allow_html=True)
 
 
 class PublicSpendingApp:
     def __init__(self):                         # Inicialización
-        self._configure_page()                  # Configurar página
-        self._setup_navigation_menu()           # Instalación del menú de navegación
+        with Perfil.rerun():                    # Tiempos de la ejecución si PERFIL o ?perfil están activos
+            self._configure_page()              # Configurar página
+            self._setup_navigation_menu()       # Instalación del menú de navegación
 
     @staticmethod                               # Modificación aquí, pycharm me lo sugirió ** ELIMINAR COMENTARIO **
     def _configure_page():
@@ -34,9 +38,15 @@ class PublicSpendingApp:
             orientation="horizontal", styles={"container": {"max-width": "300%", "padding": "10px 0"}}
         )
 
+        Perfil.anotar(pagina=selected)
+
         if selected == "Página principal":              # Mostrar contenido según la opción seleccionada
+            with Perfil.tramo("carga", "import Map_loader"):
+                import Map_loader
             Map_loader.render_map()
         elif selected == "Gráficas de Gasto":
+            with Perfil.tramo("carga", "import Graphics"):
+                import Graphics
             Graphics.mostrar_gasto_mensual_region()
         elif selected == "Comparativo":
             self._render_comparative_page()
@@ -46,16 +56,26 @@ class PublicSpendingApp:
     @staticmethod
     def _render_comparative_page():
         """Renderizar la página comparativa de gasto público"""
+        with Perfil.tramo("carga", "import Graphics"):
+            import Graphics
         st.header("Comparativo de Gasto Público")       # Colocar cabecera
 
         comparativo_tipo = st.radio(                    # Seleccionar el tipo de comparación
             "Seleccione el tipo de comparación:",
-            options=["Gasto Total Anual", "Gasto Mensual"])
+            options=["Gasto Total Anual", "Gasto Mensual", "Desglose por dimensión", "Crecimiento y participación",
+                     "Ranking y acumulado 2012-2023"])
+        Perfil.anotar(comparativo=comparativo_tipo)
 
         if comparativo_tipo == "Gasto Total Anual":     # Comparativo de gasto anual entre departamentos
             Graphics.mostrar_gasto_anual()
         elif comparativo_tipo == "Gasto Mensual":       # Comparativo de gasto mensual entre departamentos
             Graphics.mostrar_gasto_mensual()
+        elif comparativo_tipo == "Desglose por dimensión":  # PIA, PIM y devengado por nivel, sector o función
+            Graphics.mostrar_desglose()
+        elif comparativo_tipo == "Crecimiento y participación":     # Variación anual, participación y ranking
+            Graphics.mostrar_crecimiento()
+        elif comparativo_tipo == "Ranking y acumulado 2012-2023":   # Ranking por año y total del periodo
+            Graphics.mostrar_ranking()
 
     @staticmethod
     def _render_info_page():
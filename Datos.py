@@ -0,0 +1,107 @@
+import os
+import re
+import glob
+import functools
+import numpy as np
+import pandas as pd
+import streamlit as st
+import Perfil
+
+DIRECTORIO_ANUAL = "Gasto-Anual"
+DIRECTORIO_MENSUAL = "Gasto-Mensual"
+COMBINADA = re.compile(r"Gasto-Anual-(\d{4})-(\d{4})\.csv")   # La escribe Ingesta.guardar_combinada
+MESES = 12
+
+
+class AlmacenGastos:
+    """Todos los años en memoria: arreglo año × departamento (anual) y año × departamento × mes (mensual),
+    con índices de etiquetas para consultar sin leer disco ni filtrar con máscaras"""
+
+    def __init__(self, tabla_anual, mensuales):
+        self.tabla_anual = tabla_anual                              # Tabla ancha original, Departamento, y_<año>
+        self.anios = [int(columna[2:]) for columna in tabla_anual.columns if columna.startswith("y_")]
+
+        mensual = pd.concat([tabla.assign(Anio=anio) for anio, tabla in mensuales.items()], ignore_index=True)
+        mensual = mensual[mensual["Anio"].isin(self.anios) & mensual["Mes"].between(1, MESES)]
+        extra = sorted(set(mensual["Departamento"]) - set(tabla_anual["Departamento"]))
+        self.departamentos = list(tabla_anual["Departamento"]) + extra
+        self.indice_anio = {anio: i for i, anio in enumerate(self.anios)}
+        self.indice_departamento = {departamento: i for i, departamento in enumerate(self.departamentos)}
+
+        self.anual = np.zeros((len(self.anios), len(self.departamentos)))
+        for anio, i in self.indice_anio.items():
+            self.anual[i, :len(tabla_anual)] = tabla_anual["y_" + str(anio)].fillna(0).to_numpy()
+
+        self.mensual = np.zeros((len(self.anios), len(self.departamentos), MESES))
+        self.presente = np.zeros(self.mensual.shape, dtype=bool)   # Combinaciones que existen en los CSV
+        posicion = (mensual["Anio"].map(self.indice_anio).to_numpy(),
+                    mensual["Departamento"].map(self.indice_departamento).to_numpy(),
+                    mensual["Mes"].to_numpy() - 1)
+        self.mensual[posicion] = mensual["Monto"].to_numpy()
+        self.presente[posicion] = True
+
+    def total(self, anio, departamento):        # Gasto anual de un departamento, 0 si no existe
+        if departamento not in self.indice_departamento or anio not in self.indice_anio:
+            return 0
+        return self.anual[self.indice_anio[anio], self.indice_departamento[departamento]]
+
+    def monto(self, anio, departamento, mes):
+        return self.mensual[self.indice_anio[anio], self.indice_departamento[departamento], mes - 1]
+
+    @functools.lru_cache(maxsize=None)
+    def gasto_anual(self, anio):
+        """Departamento, y_<año> ordenado de mayor a menor. No modificar el resultado: es compartido."""
+        columna = "y_" + str(anio)
+        valores = self.anual[self.indice_anio[anio], :len(self.tabla_anual)]
+        orden = np.argsort(-valores, kind="stable")
+        return pd.DataFrame({"Departamento": np.asarray(self.tabla_anual["Departamento"])[orden],
+                             columna: valores[orden]}, index=orden)
+
+    @functools.lru_cache(maxsize=None)
+    def gasto_mensual(self, anio, mes=None):
+        """Departamento, Mes, Monto de un año, todos los meses o uno solo. No modificar el resultado."""
+        i = self.indice_anio[anio]
+        meses = slice(None) if mes is None else slice(mes - 1, mes)
+        departamento, mes_cero = np.nonzero(self.presente[i, :, meses])
+        primer_mes = 0 if mes is None else mes - 1
+        return pd.DataFrame({"Departamento": np.asarray(self.departamentos, dtype=object)[departamento],
+                             "Mes": mes_cero + primer_mes + 1,
+                             "Monto": self.mensual[i, :, meses][departamento, mes_cero]})
+
+    @functools.lru_cache(maxsize=None)
+    def gasto_mensual_departamento(self, anio, departamento):
+        """Departamento, Mes, Monto de un departamento ordenado por mes; vacío si no existe. No modificar."""
+        if departamento not in self.indice_departamento:
+            return pd.DataFrame({"Departamento": [], "Mes": [], "Monto": []})
+        i, j = self.indice_anio[anio], self.indice_departamento[departamento]
+        mes = np.nonzero(self.presente[i, j])[0]
+        return pd.DataFrame({"Departamento": departamento, "Mes": mes + 1, "Monto": self.mensual[i, j, mes]})
+
+
+def ruta_anual(directorio=DIRECTORIO_ANUAL):
+    """Tabla combinada más reciente: al agregar un año Ingesta escribe Gasto-Anual-<inicio>-<fin>.csv con otro
+    nombre y la anterior queda en disco. Se elige la de último año mayor y, a igualdad, la que empieza antes."""
+    candidatas = {}
+    for ruta in glob.glob(os.path.join(directorio, "Gasto-Anual-*-*.csv")):
+        encontrado = COMBINADA.fullmatch(os.path.basename(ruta))
+        if encontrado:
+            candidatas[(int(encontrado.group(2)), -int(encontrado.group(1)))] = ruta
+    if not candidatas:
+        raise FileNotFoundError(f"No hay tabla combinada Gasto-Anual-<inicio>-<fin>.csv en {directorio}")
+    return candidatas[max(candidatas)]
+
+
+def cargar(ruta=None, directorio_mensual=DIRECTORIO_MENSUAL, anios=None):
+    """Tabla combinada (por defecto la más reciente) y las mensuales de sus años, o solo de anios"""
+    with Perfil.tramo("carga", "Datos.cargar"):
+        tabla_anual = pd.read_csv(ruta or ruta_anual(), index_col=0)
+        if anios is None:
+            anios = [int(columna[2:]) for columna in tabla_anual.columns if columna.startswith("y_")]
+        mensuales = {anio: pd.read_csv(f"{directorio_mensual}/{anio}-Gasto-Mensual-Por-Region.csv") for anio in anios}
+    with Perfil.tramo("transformacion", "AlmacenGastos"):
+        return AlmacenGastos(tabla_anual, mensuales)
+
+
+@st.cache_resource                      # Una sola copia por proceso, compartida entre sesiones
+def almacen():
+    return cargar()
@@ -0,0 +1,203 @@
+import os
+import io
+import argparse
+import functools
+from urllib import request, error
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import Ingesta
+import Comprimido
+
+BLOQUE = 1024 ** 2                      # Bytes por lectura de la respuesta HTTP
+BYTES_POR_PARTE = 64 * 1024 ** 2        # Bytes acumulados antes de agregar una parte durante la descarga
+TRABAJADORES = 4                        # Años descargados a la vez
+
+
+class AgregadorEnFlujo:
+    """Recibe los bytes del archivo según llegan y agrega por partes de líneas completas"""
+
+    def __init__(self, bytes_por_parte=BYTES_POR_PARTE):
+        self.bytes_por_parte = bytes_por_parte
+        self._cabecera = None
+        self._pendiente = bytearray()
+        self._parciales = []
+
+    def __call__(self, datos):
+        self._pendiente += datos
+        if self._cabecera is None:                                  # La primera línea es la cabecera
+            fin = self._pendiente.find(b"\n")
+            if fin < 0:
+                return
+            self._cabecera = bytes(self._pendiente[:fin + 1])
+            del self._pendiente[:fin + 1]
+
+        if len(self._pendiente) >= self.bytes_por_parte:
+            corte = self._pendiente.rfind(b"\n") + 1                # Solo líneas completas
+            if corte > 0:
+                self._agregar(self._pendiente[:corte])
+                del self._pendiente[:corte]
+
+    def _agregar(self, lineas):
+        parte = io.BytesIO(self._cabecera + bytes(lineas))
+        self._parciales = [Ingesta.reducir_parciales(
+            self._parciales + [Ingesta.agregar_archivo(parte, verbose=False)])]
+
+    def finalizar(self):                # Agregar las últimas líneas y devolver la serie (departamento, mes) → monto
+        if self._cabecera is not None and self._pendiente.strip():
+            self._agregar(self._pendiente)
+        self._pendiente = bytearray()
+        return Ingesta.reducir_parciales(self._parciales)
+
+
+def _pedir(enlace, inicio):            # Respuesta desde el byte inicio; None si ya no queda nada (416)
+    peticion = request.Request(enlace, headers={"Range": f"bytes={inicio}-"} if inicio else {})
+    try:
+        return request.urlopen(peticion)
+    except error.HTTPError as e:
+        if e.code != 416:
+            raise
+        return None
+
+
+def descargar(enlace, destino, consumidor=None, bloque=BLOQUE, compresor=None):
+    """Descargar en destino.part y renombrar al terminar. Si ya existe un .part se continúa con una
+    petición Range; si el servidor no la acepta se empieza de nuevo. consumidor recibe todos los bytes
+    del archivo en orden, incluidos los ya descargados en una ejecución anterior.
+    Con compresor (Comprimido.CompresorEnHilo con continuar=True) no se escribe destino: los bytes se
+    comprimen según llegan y el .tmp del compresor hace de .part."""
+    if compresor is not None:
+        return _descargar_comprimido(enlace, compresor, consumidor, bloque)
+
+    parcial = destino + ".part"
+    inicio = os.path.getsize(parcial) if os.path.exists(parcial) else 0
+    respuesta = _pedir(enlace, inicio)
+
+    with open(parcial, "ab" if respuesta is None or respuesta.status == 206 else "wb") as archivo:
+        if consumidor is not None and archivo.mode == "ab" and inicio:
+            with open(parcial, "rb") as previo:                     # Entregar primero lo ya descargado
+                for datos in iter(functools.partial(previo.read, bloque), b""):
+                    consumidor(datos)
+
+        if respuesta is not None:
+            with respuesta:
+                for datos in iter(functools.partial(respuesta.read, bloque), b""):
+                    archivo.write(datos)
+                    if consumidor is not None:
+                        consumidor(datos)
+
+    os.replace(parcial, destino)
+    print("Descargado " + destino)
+    return destino
+
+
+def _descargar_comprimido(enlace, compresor, consumidor, bloque):
+    """Como descargar, pero desde compresor.bytes: si la descarga falla se cierra el miembro o frame en
+    curso y se guarda el punto de control, así la próxima ejecución pide solo lo que falta"""
+    respuesta = _pedir(enlace, compresor.bytes)
+    try:
+        if respuesta is not None and respuesta.status != 206 and compresor.bytes:
+            compresor.descartar()                                   # El servidor no aceptó el Range
+        if consumidor is not None:
+            for datos in compresor.previo(bloque):                  # Entregar primero lo ya comprimido
+                consumidor(datos)
+        if respuesta is not None:
+            with respuesta:
+                for datos in iter(functools.partial(respuesta.read, bloque), b""):
+                    compresor(datos)
+                    if consumidor is not None:
+                        consumidor(datos)
+    except BaseException:
+        compresor.interrumpir()                                     # Si el que falló es el compresor, descarta el .tmp
+        raise
+    destino = compresor.cerrar()
+    print("Descargado " + destino)
+    return destino
+
+
+def descargar_anio(anio, enlace, entrada=".", agregar=False, dir_anual=Ingesta.DIRECTORIO_ANUAL,
+                   dir_mensual=Ingesta.DIRECTORIO_MENSUAL, comprimir=None):
+    """Descargar un año; con agregar=True sus salidas quedan listas al terminar la descarga.
+    Con comprimir ("gzip", "zstd" o "zip") el archivo se comprime mientras llega y solo queda la versión comprimida."""
+    destino = Ingesta.ruta_entrada(anio, entrada)
+    agregador = AgregadorEnFlujo() if agregar else None
+    compresor = Comprimido.CompresorEnHilo(destino + Comprimido.EXTENSION[comprimir], comprimir,
+                                           continuar=True) if comprimir else None
+    descargar(enlace, destino, agregador, compresor=compresor)      # Con compresor el .csv nunca llega al disco
+    if agregador is None:
+        return None
+    return Ingesta.guardar_anio(anio, agregador.finalizar(), dir_anual, dir_mensual)
+
+
+def descargar_varios(enlaces, entrada=".", trabajadores=TRABAJADORES, agregar=False,
+                     dir_anual=Ingesta.DIRECTORIO_ANUAL, dir_mensual=Ingesta.DIRECTORIO_MENSUAL, comprimir=None):
+    """Descargar varios años a la vez (año → enlace), omitiendo los que ya están completos en disco"""
+    faltantes = {anio: enlace for anio, enlace in enlaces.items()
+                 if not os.path.exists(Ingesta.ruta_entrada(anio, entrada))}
+    anuales = {}
+
+    with ThreadPoolExecutor(max_workers=trabajadores) as executor:
+        futuros = {executor.submit(descargar_anio, anio, enlace, entrada, agregar, dir_anual, dir_mensual,
+                                   comprimir): anio
+                   for anio, enlace in faltantes.items()}
+        for futuro in as_completed(futuros):
+            anual = futuro.result()
+            if anual is not None:
+                anuales[futuros[futuro]] = anual
+
+    if anuales:
+        Ingesta.guardar_combinada(anuales, sorted(set(Ingesta.ANIOS) | set(anuales)), dir_anual)
+    return anuales
+
+
+class _ManejadorConRangos(SimpleHTTPRequestHandler):
+    """Servidor de archivos local con soporte de Range, para probar en lugar de datosabiertos.mef.gob.pe"""
+
+    def send_head(self):
+        rango = self.headers.get("Range")
+        ruta = self.translate_path(self.path)
+        if not rango or not os.path.isfile(ruta):
+            return super().send_head()
+
+        tamano = os.path.getsize(ruta)
+        inicio = int(rango.split("=")[1].split("-")[0])
+        if inicio >= tamano:
+            self.send_error(416)
+            return None
+
+        archivo = open(ruta, "rb")
+        archivo.seek(inicio)
+        self.send_response(206)
+        self.send_header("Content-Type", "text/csv")
+        self.send_header("Content-Range", f"bytes {inicio}-{tamano - 1}/{tamano}")
+        self.send_header("Content-Length", str(tamano - inicio))
+        self.end_headers()
+        return archivo
+
+
+def servir(carpeta, puerto=8000):
+    manejador = functools.partial(_ManejadorConRangos, directory=carpeta)
+    return ThreadingHTTPServer(("127.0.0.1", puerto), manejador)
+
+
+def _argumentos():
+    parser = argparse.ArgumentParser(description="Descarga concurrente y reanudable de los archivos del MEF")
+    parser.add_argument("--enlaces", default="OLD/enlaces.txt", help="Archivo con un enlace por año")
+    parser.add_argument("--entrada", default=".", help="Carpeta donde guardar los archivos <año>-Gastos.csv")
+    parser.add_argument("--trabajadores", type=int, default=TRABAJADORES, help="Descargas simultáneas")
+    parser.add_argument("--agregar", action="store_true", help="Agregar cada año mientras se descarga")
+    parser.add_argument("--comprimir", choices=["gzip", "zstd", "zip"],
+                        help="Guardar cada año comprimido en ese formato en lugar del .csv")
+    parser.add_argument("--servir", metavar="CARPETA", help="Solo servir una carpeta local con soporte de Range")
+    parser.add_argument("--puerto", type=int, default=8000)
+    return parser
+
+
+if __name__ == "__main__":
+    import Manifiesto
+
+    args = _argumentos().parse_args()
+    if args.servir:
+        servir(args.servir, args.puerto).serve_forever()
+    else:
+        descargar_varios(Manifiesto.leer_enlaces(args.enlaces), args.entrada, args.trabajadores, args.agregar,
+                         comprimir=args.comprimir)
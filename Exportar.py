@@ -0,0 +1,215 @@
+import os
+import json
+import shutil
+import argparse
+from jinja2 import Template
+import Cache
+import Graphics
+
+DIRECTORIO = "sitio"
+TITULO = "Visualización del Gasto Público en el Perú (2012-2023) 🌍"
+MENU = ["Página principal", "Gráficas de Gasto", "Comparativo", "Información"]
+
+# Páginas de Graphics: menú y etiqueta como en Dashboard.py, elementos del render y proporción de sus columnas
+PAGINAS = {
+    "region": {"menu": "Gráficas de Gasto", "etiqueta": None,
+               "elementos": ["tabla", "barras", "pastel"], "columnas": [1, 2, 2]},
+    "anual": {"menu": "Comparativo", "etiqueta": "Gasto Total Anual", "elementos": ["grafico", "tabla"],
+              "columnas": [5, 2]},
+    "mensual": {"menu": "Comparativo", "etiqueta": "Gasto Mensual", "elementos": ["grafico"], "columnas": [1]},
+    "desglose": {"menu": "Comparativo", "etiqueta": "Desglose por dimensión", "elementos": ["grafico", "tabla"],
+                 "columnas": [5, 2]},
+    "crecimiento": {"menu": "Comparativo", "etiqueta": "Crecimiento y participación",
+                    "elementos": ["grafico", "tabla"], "columnas": [3, 4]},
+    "ranking": {"menu": "Comparativo", "etiqueta": "Ranking y acumulado 2012-2023", "elementos": ["grafico", "tabla"],
+                "columnas": [4, 3]},
+}
+
+# Página de información: cada fila es una lista de archivos, que se muestran en columnas
+INFORMACION = [["CSS/style.css"], ["CSS/autores_1.css", "CSS/autores_2.css"], ["CSS/info.css"]]
+
+CAMPOS = ["anio", "mes", "departamento", "dimension"]     # Mismo orden que las claves de Graphics
+
+
+def nombre_archivo(clave):              # Mismo nombre que arma index.html con la selección
+    return "_".join(str(valor).replace(" ", "-") for valor in clave if valor is not None) + ".json"
+
+
+def _selectores(opciones):
+    """Selectores de una página para index.html: campo y pares [valor, texto]"""
+    etiquetas = {valor: texto for texto, valor in Graphics.dimensiones.items()}
+    return [{"campo": campo, "opciones": [[valor, etiquetas.get(valor, str(valor))] for valor in valores]}
+            for campo, valores in zip(CAMPOS, opciones) if valores is not None]
+
+
+def _leer(ruta):
+    with open(ruta, "r", encoding="utf-8") as archivo:
+        return archivo.read()
+
+
+def exportar(directorio=DIRECTORIO, cache=None):
+    """Escribir index.html, mapa.html y un JSON por página y selección; devuelve la cantidad de selecciones"""
+    import Map_loader
+
+    cache = cache or Cache.CacheRenderizado(Cache.version_renders())
+    datos = os.path.join(directorio, "datos")
+    if os.path.isdir(datos):
+        shutil.rmtree(datos)
+    os.makedirs(datos)
+
+    cantidad = 0
+    for clave in Graphics.claves():     # Desde la caché de renders si ya se precalculó
+        with open(os.path.join(datos, nombre_archivo(clave)), "w", encoding="utf-8") as archivo:
+            json.dump(Graphics.render(clave, cache), archivo, ensure_ascii=False, separators=(",", ":"))
+        cantidad += 1
+
+    paginas = {pagina: {**PAGINAS[pagina], "selectores": _selectores(opciones)}
+               for pagina, opciones in Graphics.selecciones().items()}
+    indice = {"titulo": TITULO, "menu": MENU, "paginas": paginas,
+              "informacion": [[_leer(ruta) for ruta in fila] for fila in INFORMACION]}
+    with open(os.path.join(datos, "indice.json"), "w", encoding="utf-8") as archivo:
+        json.dump(indice, archivo, ensure_ascii=False)
+
+    with open(os.path.join(directorio, "mapa.html"), "wb") as archivo:    # Ya en bytes (UTF-8)
+        archivo.write(Map_loader.mapa_unificado_html())   # Todos los años, el cambio de año ya es en el navegador
+    with open(os.path.join(directorio, "index.html"), "w", encoding="utf-8") as archivo:
+        archivo.write(_PLANTILLA.render(titulo=TITULO))
+    return cantidad
+
+
+_PLANTILLA = Template("""<!DOCTYPE html>
+<html lang="es">
+<head>
+<meta charset="utf-8">
+<title>Gasto público en el Perú 🌍</title>
+<script src="https://cdn.jsdelivr.net/npm/vega@5"></script>
+<script src="https://cdn.jsdelivr.net/npm/vega-lite@5"></script>
+<script src="https://cdn.jsdelivr.net/npm/vega-embed@6"></script>
+<script src="https://cdn.jsdelivr.net/npm/marked@12/marked.min.js"></script>
+<style>
+    body { font-family: "Source Sans Pro", sans-serif; margin: 0 auto; max-width: 1400px; padding: 0 2rem; }
+    nav, .cinta { display: flex; gap: 0.5rem; flex-wrap: wrap; padding: 10px 0; }
+    nav button, .cinta button { border: none; border-radius: 0.5rem; padding: 0.5rem 1rem; background: #f0f2f6;
+                                cursor: pointer; }
+    nav button.activo, .cinta button.activo { background: #ff4b4b; color: white; }
+    .fila { display: flex; gap: 1.5rem; align-items: flex-start; }
+    .fila > div { min-width: 0; }
+    .tabla { max-height: 600px; overflow-y: auto; font-size: 14px; }
+    .aviso { background: #fffce7; padding: 1rem; border-radius: 0.5rem; }
+    iframe { border: none; width: 100%; height: 600px; }
+</style>
+</head>
+<body>
+<h1>{{ titulo }}</h1>
+<nav id="menu"></nav>
+<div id="contenido"></div>
+<script>
+// Misma navegación que Dashboard.py; cada selección se lee de datos/<página>_<año>_<mes>_<departamento>_<dimensión>.json
+const CAMPOS = ["anio", "mes", "departamento", "dimension"];
+const estado = {menu: null, comparativo: null, seleccion: {}};
+let indice;
+
+function elemento(tipo, atributos = {}, hijos = []) {
+    const nodo = Object.assign(document.createElement(tipo), atributos);
+    hijos.forEach(hijo => nodo.append(hijo));
+    return nodo;
+}
+
+function cinta(opciones, actual, elegir) {
+    return elemento("div", {className: "cinta"}, opciones.map(([valor, texto]) =>
+        elemento("button", {textContent: texto, className: String(valor) === String(actual) ? "activo" : "",
+                            onclick: () => elegir(valor)})));
+}
+
+function archivo(pagina) {
+    const partes = [pagina].concat(CAMPOS.map(campo => estado.seleccion[pagina][campo]))
+        .filter(valor => valor !== undefined);
+    return "datos/" + partes.map(valor => String(valor).replaceAll(" ", "-")).join("_") + ".json";
+}
+
+async function mostrarPagina(pagina, contenedor) {
+    const descripcion = indice.paginas[pagina];
+    const seleccion = estado.seleccion[pagina] = estado.seleccion[pagina] || {};
+    descripcion.selectores.forEach(({campo, opciones}) => {
+        if (!(campo in seleccion)) seleccion[campo] = opciones[0][0];
+        const elegir = valor => { seleccion[campo] = valor; dibujar(); };
+        if (campo === "anio" || campo === "mes") {          // Cintas de opciones, como crear_cinta_de_opciones
+            contenedor.append(cinta(opciones, seleccion[campo], elegir));
+        } else {
+            const lista = elemento("select", {onchange: evento => elegir(evento.target.value)},
+                opciones.map(([valor, texto]) => elemento("option", {value: valor, textContent: texto,
+                                                                    selected: valor === seleccion[campo]})));
+            contenedor.append(lista);
+        }
+    });
+
+    const render = await (await fetch(archivo(pagina))).json();
+    const total = descripcion.columnas.reduce((a, b) => a + b, 0);
+    const fila = elemento("div", {className: "fila"});
+    contenedor.append(fila);
+    for (const [i, nombre] of descripcion.elementos.entries()) {
+        const columna = elemento("div");
+        columna.style.flex = String(descripcion.columnas[i] / total);
+        fila.append(columna);
+        if (render[nombre] === null) {
+            columna.append(elemento("div", {className: "aviso", textContent: "No hay datos para la selección realizada."}));
+        } else if (nombre === "tabla") {
+            columna.append(elemento("div", {className: "tabla", innerHTML: render[nombre]}));
+        } else {
+            const especificacion = JSON.parse(render[nombre]);
+            if (especificacion.width === undefined) especificacion.width = "container";
+            await vegaEmbed(columna, especificacion, {actions: false});
+        }
+    }
+}
+
+async function dibujar() {
+    const menu = document.getElementById("menu"), contenido = document.getElementById("contenido");
+    menu.replaceChildren(...indice.menu.map(opcion => elemento("button", {
+        textContent: opcion, className: opcion === estado.menu ? "activo" : "",
+        onclick: () => { estado.menu = opcion; dibujar(); }})));
+    contenido.replaceChildren();
+
+    if (estado.menu === "Página principal") {
+        contenido.append(elemento("iframe", {src: "mapa.html"}));
+    } else if (estado.menu === "Información") {
+        indice.informacion.forEach(fila => contenido.append(elemento("div", {className: "fila"},
+            fila.map(texto => elemento("div", {innerHTML: marked.parse(texto), style: "flex: 1"})))));
+    } else if (estado.menu === "Comparativo") {
+        contenido.append(elemento("h2", {textContent: "Comparativo de Gasto Público"}));
+        const paginas = Object.keys(indice.paginas).filter(pagina => indice.paginas[pagina].menu === "Comparativo");
+        estado.comparativo = estado.comparativo || paginas[0];
+        contenido.append(cinta(paginas.map(pagina => [pagina, indice.paginas[pagina].etiqueta]), estado.comparativo,
+                               pagina => { estado.comparativo = pagina; dibujar(); }));
+        await mostrarPagina(estado.comparativo, contenido);
+    } else {
+        const pagina = Object.keys(indice.paginas).find(pagina => indice.paginas[pagina].menu === estado.menu);
+        await mostrarPagina(pagina, contenido);
+    }
+}
+
+fetch("datos/indice.json").then(respuesta => respuesta.json()).then(datos => {
+    indice = datos;
+    estado.menu = indice.menu[0];
+    dibujar();
+});
+</script>
+</body>
+</html>
+""")
+
+
+def _argumentos():
+    parser = argparse.ArgumentParser(description="Exportar todas las páginas del dashboard como un sitio estático")
+    parser.add_argument("--salida", default=DIRECTORIO, help="Carpeta del sitio (index.html, mapa.html, datos/)")
+    return parser
+
+
+if __name__ == "__main__":
+    args = _argumentos().parse_args()
+    Cache.cargar_una_vez()
+    cantidad = exportar(args.salida)
+    tamano = sum(os.path.getsize(os.path.join(raiz, nombre)) for raiz, _, nombres in os.walk(args.salida)
+                 for nombre in nombres)
+    print(f"{cantidad} selecciones exportadas en {args.salida} ({tamano / 1024 ** 2:.1f} MiB). "
+          f"Se puede servir con cualquier servidor de archivos, por ejemplo: python -m http.server -d {args.salida}")
@@ -0,0 +1,237 @@
+import json
+import argparse
+import numpy as np
+
+RUTA_GEOJSON = "Other/peru_departamental_simple.geojson"
+RUTA_TOPOJSON = "Other/peru_departamental.topojson"
+OBJETO = "departamentos"
+CUANTIZACION = 100000                   # Celdas por eje; ~15 m en el Perú, invisible a cualquier zoom del mapa
+
+# Niveles de detalle: cada uno se usa hasta zoom_max, con una tolerancia de medio píxel a ese zoom.
+# El último nivel (sin zoom_max) son los arcos completos, solo cuantizados. El mapa abre en zoom 5; alejado,
+# ese mismo nivel queda por debajo del cuarto de píxel, así que un nivel para zoom 4 no ahorraría nada visible.
+NIVELES = [5]
+
+
+def grados_por_pixel(zoom):             # Ancho de un píxel en grados, en mosaicos de 256 px
+    return 360 / (256 * 2 ** zoom)
+
+
+def _anillos(geometria):                # Polígonos como listas de anillos, para Polygon y MultiPolygon
+    if geometria["type"] == "Polygon":
+        return [geometria["coordinates"]]
+    return geometria["coordinates"]
+
+
+def _cuantizar(geojson, n):
+    puntos = np.array([punto[:2] for feature in geojson["features"] for poligono in _anillos(feature["geometry"])
+                       for anillo in poligono for punto in anillo])
+    minimo, maximo = puntos.min(axis=0), puntos.max(axis=0)
+    escala = (maximo - minimo) / (n - 1)
+    return minimo, escala
+
+
+def _cortar_anillo(anillo, uniones):
+    """Dividir un anillo cuantizado en arcos que empiezan y terminan en uniones"""
+    anillo = anillo[:-1]                                            # Quitar el punto de cierre
+    indices = [i for i, punto in enumerate(anillo) if punto in uniones]
+    if not indices:                                                 # Anillo sin vecinos: un solo arco cerrado,
+        inicio = anillo.index(min(anillo))                          # rotado a un punto canónico
+        rotado = anillo[inicio:] + anillo[:inicio]
+        return [rotado + [rotado[0]]]
+
+    rotado = anillo[indices[0]:] + anillo[:indices[0]]
+    cortes = [i - indices[0] for i in indices] + [len(anillo)]
+    rotado = rotado + [rotado[0]]
+    return [rotado[a:b + 1] for a, b in zip(cortes[:-1], cortes[1:])]
+
+
+def _uniones(anillos):
+    """Puntos donde cambia el conjunto de vecinos: ahí empieza o termina un borde compartido"""
+    vecinos = {}
+    uniones = set()
+    for anillo in anillos:
+        anillo = anillo[:-1]
+        for i, punto in enumerate(anillo):
+            par = frozenset((anillo[i - 1], anillo[(i + 1) % len(anillo)]))
+            if vecinos.setdefault(punto, par) != par:
+                uniones.add(punto)
+    return uniones
+
+
+def _sin_repetidos(anillo):             # Puntos consecutivos iguales tras cuantizar
+    resultado = [anillo[0]]
+    for punto in anillo[1:]:
+        if punto != resultado[-1]:
+            resultado.append(punto)
+    return resultado
+
+
+def douglas_peucker(puntos, tolerancia):
+    """Índices de los puntos que se conservan; extremos siempre incluidos"""
+    puntos = np.asarray(puntos, dtype="float64")
+    conservar = np.zeros(len(puntos), dtype=bool)
+    conservar[[0, -1]] = True
+    pila = [(0, len(puntos) - 1)]
+    while pila:
+        a, b = pila.pop()
+        if b - a < 2:
+            continue
+        intermedios = puntos[a + 1:b]
+        direccion = puntos[b] - puntos[a]
+        largo = np.hypot(*direccion)
+        if largo == 0:                                              # Arco cerrado: distancia al extremo
+            distancias = np.hypot(*(intermedios - puntos[a]).T)
+        else:
+            relativos = intermedios - puntos[a]
+            distancias = np.abs(direccion[0] * relativos[:, 1] - direccion[1] * relativos[:, 0]) / largo
+        mayor = int(np.argmax(distancias))
+        if distancias[mayor] > tolerancia:
+            conservar[a + 1 + mayor] = True
+            pila += [(a, a + 1 + mayor), (a + 1 + mayor, b)]
+    return np.flatnonzero(conservar)
+
+
+def _simplificar(arco, tolerancia):     # Índices de los puntos del arco que conserva el nivel
+    indices = douglas_peucker(arco, tolerancia)
+    if arco[0] == arco[-1] and len(indices) < 4:                    # Un arco cerrado necesita al menos 4 puntos
+        indices = np.unique(np.concatenate([indices, np.linspace(0, len(arco) - 1, 4).astype(int)]))
+    return indices
+
+
+def _delta(arco):                       # Codificación delta de TopoJSON; también para listas de índices
+    arco = np.asarray(arco, dtype="int64")
+    return np.concatenate([arco[:1], np.diff(arco, axis=0)]).tolist()
+
+
+def construir_topologia(geojson, cuantizacion=CUANTIZACION, niveles=NIVELES):
+    """TopoJSON cuantizado y con codificación delta: los bordes entre departamentos se guardan una sola vez.
+    "niveles" agrega, por zoom máximo, qué puntos de cada arco de "arcs" se conservan al simplificar (índices
+    con codificación delta): el mapa va dentro del HTML de la página y así cada nivel no repite coordenadas."""
+    minimo, escala = _cuantizar(geojson, cuantizacion)
+
+    def cuantizar(anillo):
+        return _sin_repetidos([tuple(int(v) for v in np.round((np.asarray(punto[:2]) - minimo) / escala))
+                               for punto in anillo])
+
+    cuantizados = [[[cuantizar(anillo) for anillo in poligono] for poligono in _anillos(feature["geometry"])]
+                   for feature in geojson["features"]]
+    uniones = _uniones([anillo for poligonos in cuantizados for poligono in poligonos for anillo in poligono])
+
+    arcos = []
+    indice = {}                                                     # Arco (tupla de puntos) → referencia TopoJSON
+    geometrias = []
+    for feature, poligonos in zip(geojson["features"], cuantizados):
+        referencias = []
+        for poligono in poligonos:
+            referencias.append([])
+            for anillo in poligono:
+                referencias[-1].append([])
+                for arco in _cortar_anillo(anillo, uniones):
+                    clave = tuple(arco)
+                    if clave not in indice:
+                        indice[clave] = len(arcos)
+                        indice[tuple(reversed(arco))] = ~len(arcos)  # Mismo borde recorrido al revés
+                        arcos.append(arco)
+                    referencias[-1][-1].append(indice[clave])
+
+        geometria = {"type": "Polygon", "arcs": referencias[0]} if feature["geometry"]["type"] == "Polygon" else \
+            {"type": "MultiPolygon", "arcs": referencias}
+        geometrias.append({**geometria, "properties": feature["properties"]})
+
+    celda = float(escala.max())
+    return {
+        "type": "Topology",
+        "transform": {"scale": escala.tolist(), "translate": minimo.tolist()},
+        "objects": {OBJETO: {"type": "GeometryCollection", "geometries": geometrias}},
+        "arcs": [_delta(arco) for arco in arcos],
+        "niveles": [{"zoom_max": zoom, "conservar": [_delta(_simplificar(arco, grados_por_pixel(zoom) / 2 / celda))
+                                                     for arco in arcos]}
+                    for zoom in niveles],
+    }
+
+
+def _arcos_absolutos(topologia, nivel=None):
+    escala = np.asarray(topologia["transform"]["scale"])
+    traslacion = np.asarray(topologia["transform"]["translate"])
+    arcos = [np.cumsum(np.asarray(arco, dtype="float64"), axis=0) * escala + traslacion for arco in topologia["arcs"]]
+    if nivel is None:
+        return arcos
+    return [arco[np.cumsum(conservar)] for arco, conservar in zip(arcos, topologia["niveles"][nivel]["conservar"])]
+
+
+def decodificar(topologia, nivel=None):
+    """Nombre del departamento → lista de polígonos (listas de anillos en coordenadas reales)"""
+    arcos = _arcos_absolutos(topologia, nivel)
+
+    def anillo(referencias):
+        partes = [arcos[r] if r >= 0 else arcos[~r][::-1] for r in referencias]
+        return np.vstack([partes[0]] + [parte[1:] for parte in partes[1:]])
+
+    resultado = {}
+    for geometria in topologia["objects"][OBJETO]["geometries"]:
+        poligonos = [geometria["arcs"]] if geometria["type"] == "Polygon" else geometria["arcs"]
+        resultado[geometria["properties"]["NOMBDEP"]] = [[anillo(r) for r in poligono] for poligono in poligonos]
+    return resultado
+
+
+def _distancia_a_anillo(puntos, anillo):  # Distancia de cada punto al segmento más cercano del anillo
+    a, b = anillo[:-1], anillo[1:]
+    ab = b - a
+    largo = np.maximum((ab ** 2).sum(axis=1), 1e-30)
+    t = np.clip(((puntos[:, None, :] - a) * ab).sum(axis=2) / largo, 0, 1)
+    cercano = a + t[..., None] * ab
+    return np.sqrt(((puntos[:, None, :] - cercano) ** 2).sum(axis=2)).min(axis=1)
+
+
+def _puntos_de_anillo(anillo):         # Vértices y puntos medios de cada segmento, para medir desde el anillo
+    return np.vstack([anillo, (anillo[:-1] + anillo[1:]) / 2])
+
+
+def validar(geojson, topologia):
+    """Distancia de Hausdorff simétrica (en grados) entre los anillos originales y cada nivel de detalle:
+    de los vértices originales al anillo decodificado y de los vértices y puntos medios decodificados al
+    original, para que un atajo que corta la figura tampoco pase. Lanza ValueError si algún nivel supera
+    su tolerancia más una celda de cuantización."""
+    celda = float(max(topologia["transform"]["scale"]))
+    limites = [(None, 1.5 * celda)] + [(i, grados_por_pixel(nivel["zoom_max"]) / 2 + 1.5 * celda)
+                                       for i, nivel in enumerate(topologia["niveles"])]
+    originales = {feature["properties"]["NOMBDEP"]: _anillos(feature["geometry"]) for feature in geojson["features"]}
+    errores = {}
+
+    for nivel, limite in limites:
+        maximo = 0.0
+        for nombre, poligonos in decodificar(topologia, nivel).items():
+            for poligono_original, poligono in zip(originales[nombre], poligonos):
+                for anillo_original, anillo in zip(poligono_original, poligono):
+                    puntos = np.asarray(anillo_original, dtype="float64")[:, :2]
+                    maximo = max(maximo, float(_distancia_a_anillo(puntos, anillo).max()),
+                                 float(_distancia_a_anillo(_puntos_de_anillo(anillo), puntos).max()))
+        if maximo > limite:
+            raise ValueError(f"Nivel {nivel}: desplazamiento de {maximo:.6f}° supera el límite de {limite:.6f}°")
+        errores["completo" if nivel is None else topologia["niveles"][nivel]["zoom_max"]] = maximo
+    return errores
+
+
+def convertir(entrada=RUTA_GEOJSON, salida=RUTA_TOPOJSON):
+    with open(entrada, "r") as archivo:
+        geojson = json.load(archivo)
+    topologia = construir_topologia(geojson)
+    errores = validar(geojson, topologia)
+
+    with open(salida, "w") as archivo:
+        json.dump(topologia, archivo, separators=(",", ":"))
+    return errores
+
+
+def _argumentos():
+    parser = argparse.ArgumentParser(description="Convertir los límites departamentales a TopoJSON compacto")
+    parser.add_argument("--entrada", default=RUTA_GEOJSON)
+    parser.add_argument("--salida", default=RUTA_TOPOJSON)
+    return parser
+
+
+if __name__ == "__main__":
+    args = _argumentos().parse_args()
+    for nivel, error in convertir(args.entrada, args.salida).items():
+        print(f"Nivel {nivel}: desplazamiento máximo {error:.6f}°")
@@ -1,7 +1,14 @@
+import json
+import itertools
 import streamlit as st
 import pandas as pd
 import altair as alt
 from streamlit_option_menu import option_menu
+import Datos
+import Cubo
+import Cache
+import Analitica
+import Perfil
 
 meses = {"ENE": 1, "FEB": 2, "MAR": 3, "ABR": 4, "MAY": 5, "JUN": 6,
          "JUL": 7, "AGO": 8, "SET": 9, "OCT": 10, "NOV": 11, "DIC": 12}
@@ -17,6 +24,10 @@ departamentos = ["AMAZONAS", "ANCASH", "APURIMAC", "AREQUIPA",
                  "SAN MARTIN", "TACNA", "TUMBES", "UCAYALI",
                  "CALLAO"]
 
+dimensiones = {"Nivel de gobierno": "NIVEL_GOBIERNO_NOMBRE", "Sector": "SECTOR_NOMBRE", "Función": "FUNCION_NOMBRE"}
+
+medidas = {"MONTO_PIA": "PIA", "MONTO_PIM": "PIM", "MONTO_DEVENGADO": "Devengado"}
+
 colores = ['black', 'brown', 'red', 'orange', 'yellow', 'green',
            'blue', 'magenta', '#404040', '#F0F0F0', 'gold', 'silver']
 
@@ -26,8 +37,17 @@ def crear_cinta_de_opciones(opciones):  # Crear una cinta de opciones, informaci
                        orientation="horizontal", styles={"container": {"max-width": "300%", "padding": "10px 0"}})
 
 
+def tabla_html(datos):                  # Convertir de pandas a html
+    with Perfil.tramo("serializacion", "tabla html"):
+        return datos.to_html(index=False)
+
+
 def crear_tabla(datos):                 # Crear una tabla, convierte de pandas a html y lo coloca como css
-    html_table = datos.to_html(index=False)
+    colocar_tabla(tabla_html(datos))
+
+
+def colocar_tabla(html_table):          # Colocar una tabla html ya construida
+    Perfil.carga_util("tabla", html_table)
     st.markdown(f"""
         <div style="max-height: 600px; overflow-y: auto; font-size: 14px;">
             {html_table}
@@ -35,7 +55,14 @@ def crear_tabla(datos):                 # Crear una tabla, convierte de pandas a
     """, unsafe_allow_html=True)
 
 
-def crear_grafico(datos, selected, titulo, tipo):
+def especificacion(datos, selected, titulo, tipo):     # Gráfico de Altair como Vega-Lite en JSON
+    with Perfil.tramo("construccion", f"grafico {tipo}"):
+        graph = _grafico(datos, selected, titulo, tipo)
+    with Perfil.tramo("serializacion", f"grafico {tipo}"):          # Validación y conversión a JSON
+        return json.dumps(graph.to_dict(), separators=(",", ":"))
+
+
+def _grafico(datos, selected, titulo, tipo):           # Objeto de Altair, todavía sin serializar
     if tipo == 1:     # Gasto anual por departamento. Múltiples colores, ningún código específico
         graph = alt.Chart(datos).mark_bar().encode(
             x=alt.X('Departamento:O', title='Departamento', sort='-y'),
@@ -66,6 +93,35 @@ def crear_grafico(datos, selected, titulo, tipo):
                      alt.Tooltip('Monto:Q', format=',.2f', title='Gasto (S/)')]
         ).properties(title=titulo, height=500).configure_title(fontSize=18, anchor='start', color='gray')
 
+    elif tipo == 5:     # Desglose por una dimensión del cubo. Barras agrupadas de PIA, PIM y devengado
+        graph = alt.Chart(datos).transform_fold(list(medidas.values()), as_=['Medida', 'Monto']).mark_bar().encode(
+            y=alt.Y(selected + ':N', title=None, sort='-x'),
+            x=alt.X('Monto:Q', title='Monto (S/)'),
+            yOffset='Medida:N',
+            color=alt.Color('Medida:N', scale=alt.Scale(scheme='inferno'), title='Medida'),
+            tooltip=[alt.Tooltip(selected + ':N'), alt.Tooltip('Medida:N'),
+                     alt.Tooltip('Monto:Q', format=',.2f', title='Monto (S/)')]
+        ).properties(title=titulo).configure_title(fontSize=18, anchor='start', color='gray')
+
+    elif tipo == 6:     # Crecimiento respecto al año anterior. Barras verdes si crece, rojas si cae
+        graph = alt.Chart(datos).mark_bar().encode(
+            x=alt.X('Departamento:O', title='Departamento', sort='-y'),
+            y=alt.Y('Crecimiento:Q', title='Crecimiento respecto al año anterior (%)'),
+            color=alt.condition(alt.datum.Crecimiento >= 0, alt.value('green'), alt.value('red')),
+            tooltip=[alt.Tooltip('Departamento:O', title='Departamento'),
+                     alt.Tooltip('Crecimiento:Q', format='.1f', title='Crecimiento (%)'),
+                     alt.Tooltip('Participacion:Q', format='.2f', title='Participación nacional (%)')]
+        ).properties(title=titulo, height=640).configure_title(fontSize=18, anchor='start', color='gray')
+
+    elif tipo == 7:     # Ranking de cada departamento a lo largo de los años. Líneas, el primer puesto arriba
+        graph = alt.Chart(datos).mark_line(point=True).encode(
+            x=alt.X('Anio:O', title='Año'),
+            y=alt.Y('ranking:Q', title='Ranking', scale=alt.Scale(reverse=True, domain=[1, datos['ranking'].max()])),
+            color=alt.Color('Departamento:N', scale=alt.Scale(scheme='tableau20'), title='Departamento'),
+            tooltip=[alt.Tooltip('Departamento:N', title='Departamento'), alt.Tooltip('Anio:O', title='Año'),
+                     alt.Tooltip('ranking:Q', title='Ranking')]
+        ).properties(title=titulo, height=640).configure_title(fontSize=18, anchor='start', color='gray')
+
     else:               # Gasto mensual de un solo departamento. Gráfico circular, código de colores de resistencia
         graph = alt.Chart(datos).mark_arc(stroke='black', strokeWidth=2).encode(
             theta=alt.Theta('Monto:Q', title='Porcentaje de Gasto'),
@@ -76,69 +132,215 @@ def crear_grafico(datos, selected, titulo, tipo):
             title=f"Distribución Porcentual del Gasto Mensual - {selected}", height=500, width=500
         ).configure_title(fontSize=16, anchor='middle', color='gray')
 
-    st.altair_chart(graph, use_container_width=True)    # Mostrar cualquier opción seleccionado
+    return graph
+
+
+def crear_grafico(datos, selected, titulo, tipo):
+    colocar_grafico(especificacion(datos, selected, titulo, tipo))
+
+
+def colocar_grafico(vega_lite):         # Mostrar un gráfico ya construido
+    Perfil.carga_util("grafico", vega_lite)
+    with Perfil.tramo("serializacion", "vega_lite_chart"):             # Envío del JSON a Streamlit
+        st.vega_lite_chart(spec=json.loads(vega_lite), use_container_width=True)
+
+
+# ----- Gráficos y tablas de cada página, construidos una vez por selección y guardados en Cache -----
+
+def _anual(anio):
+    year = Datos.almacen().gasto_anual(anio)                            # Ya ordenado, desde memoria
+    return {"grafico": especificacion(year, anio, "Comparativo de Gasto Total Anual por Departamento", 1),
+            "tabla": tabla_html(year.assign(**{"y_"+str(anio): year["y_"+str(anio)].apply(lambda x: f"{x:,.2f}")}))}
+
+
+def _mensual(anio, mes):
+    if mes != "TODOS":                                                          # Mostrar gráfico normal (un mes)
+        datos_filtrados = Datos.almacen().gasto_mensual(anio, meses[mes])
+        titulo = f"Comparativo de Gasto Mensual por Departamento - Mes {mes}"
+
+    else:                                                                       # Mostrar gráfico apilado (año entero)
+        datos_filtrados = Datos.almacen().gasto_mensual(anio)
+        titulo = "Comparativo de Gasto Mensual por Departamento (Todos los Meses)"
+
+    return {"grafico": None if datos_filtrados.empty else especificacion(datos_filtrados, mes, titulo, 2)}
+
+
+def _region(anio, departamento):
+    datos_departamento = Datos.almacen().gasto_mensual_departamento(anio, departamento)  # Ya ordenado
+    temporal = pd.concat([datos_departamento["Mes"], datos_departamento["Monto"]], axis=1)
+    temporal["Mes"] = temporal["Mes"].apply(lambda x: meses_2[int(x)])
+    temporal["Monto"] = temporal["Monto"].apply(lambda x: f"{x:,.2f}")
+
+    if datos_departamento.empty:
+        return {"tabla": tabla_html(temporal), "barras": None, "pastel": None}
+    return {"tabla": tabla_html(temporal),
+            "barras": especificacion(datos_departamento, departamento, f"Gasto Mensual - {departamento}", 3),
+            "pastel": especificacion(datos_departamento, departamento,
+                                     f"Distribución Porcentual del Gasto Mensual - {departamento}", 4)}
+
+
+def _desglose(anio, departamento, dimension):
+    filtros = {"Anio": anio}
+    if departamento != "TODOS":
+        filtros["Departamento"] = "PROVINCIA CONSTITUCIONAL DEL CALLAO" if departamento == "CALLAO" else departamento
+    datos = Cubo.cubo().consultar(por=[dimension], filtros=filtros).rename(columns=medidas)
+    if datos.empty:
+        return {"grafico": None, "tabla": None}
+
+    tabla = datos.assign(**{"Ejecución (%)": (100 * datos["Devengado"] / datos["PIM"]).round(1)})
+    return {"grafico": especificacion(datos, dimension, f"PIA, PIM y devengado por {dimension} - {anio}", 5),
+            "tabla": tabla_html(tabla[[dimension, "CANTIDAD", "Ejecución (%)"]].sort_values("CANTIDAD",
+                                                                                            ascending=False))}
+
+
+def _indicadores():                     # Calculados una vez por proceso sobre Datos.almacen()
+    return Analitica.indicadores()
+
+
+def _crecimiento(anio):
+    tabla = _indicadores().tabla_anio(anio)
+    datos = tabla.rename(columns={"Crecimiento (%)": "Crecimiento", "Participación (%)": "Participacion"})
+    formato = {"Gasto": "{:,.2f}", "Crecimiento (%)": "{:,.1f}", "Participación (%)": "{:,.2f}",
+               "Avance 1er semestre (%)": "{:,.1f}"}
+    return {"grafico": especificacion(datos[["Departamento", "Crecimiento", "Participacion"]], anio,
+                                      f"Crecimiento del Gasto respecto a {anio - 1}", 6),
+            "tabla": tabla_html(tabla.assign(**{columna: tabla[columna].map(patron.format)
+                                                for columna, patron in formato.items()}))}
+
+
+def _ranking():
+    indicadores = _indicadores()
+    tabla = indicadores.tabla_periodo()
+    periodo = f"{min(indicadores.anios)}-{max(indicadores.anios)}"
+    formato = {"Acumulado": "{:,.2f}", "Participación (%)": "{:,.2f}", "Crecimiento compuesto (%)": "{:,.1f}"}
+    return {"grafico": especificacion(indicadores.serie("ranking"), periodo,
+                                      f"Ranking de Gasto por Departamento {periodo}", 7),
+            "tabla": tabla_html(tabla.assign(**{columna: tabla[columna].map(patron.format)
+                                                for columna, patron in formato.items()}))}
+
+
+_CONSTRUCTORES = {"anual": _anual, "mensual": _mensual, "region": _region, "desglose": _desglose,
+                  "crecimiento": _crecimiento, "ranking": _ranking}
+
+
+def render(clave, cache=None):          # clave = (página, año, mes, departamento, dimensión); None si no aplica
+    def construir():
+        with Perfil.tramo("transformacion", clave[0]):
+            return _CONSTRUCTORES[clave[0]](*[valor for valor in clave[1:] if valor is not None])
+    return (cache or Cache.renders()).obtener(clave, construir)
+
+
+def selecciones():
+    """Opciones de cada página para (año, mes, departamento, dimensión); None donde la página no elige"""
+    anios = list(range(2012, 2024))
+    paginas = {"anual": (anios, None, None, None),
+               "mensual": (anios, ["TODOS"] + list(meses), None, None),
+               "region": (anios, None, departamentos, None),
+               "crecimiento": (anios[1:], None, None, None),
+               "ranking": (None, None, None, None)}
+    if Cubo.cubo() is not None:
+        paginas["desglose"] = (anios, None, ["TODOS"] + departamentos, list(dimensiones.values()))
+    return paginas
+
+
+def claves():                           # Todas las selecciones posibles de cada página
+    for pagina, opciones in selecciones().items():
+        yield from ((pagina,) + combinacion for combinacion in itertools.product(
+            *[[None] if valores is None else valores for valores in opciones]))
+
+
+def precalcular(cache=None):
+    """Construir (o leer del disco) todas las combinaciones, para servir cada clic desde la caché"""
+    cantidad = 0
+    for clave in claves():
+        render(clave, cache)
+        cantidad += 1
+    return cantidad
 
 
 def mostrar_gasto_anual():
     selected = crear_cinta_de_opciones([year for year in range(2012, 2024)])
-
-    gasto_anual = pd.read_csv("Gasto-Anual/Gasto-Anual-2012-2023.csv")  # Abrir archivo, ordenar y seleccionar
-    year = pd.concat([gasto_anual["Departamento"], gasto_anual["y_"+str(selected)]], axis=1)
-    year = year.sort_values(by="y_"+str(selected), ascending=False)
+    elementos = render(("anual", selected, None, None, None))
 
     col1, col2 = st.columns([5, 2])                                     # Asignar columnas con diferentes proporciones
     with col1:                                                          # Colocar gráfico de barras
-        crear_grafico(year, selected, "Comparativo de Gasto Total Anual por Departamento", 1)
-    with col2:                                                          # Convertir dataframe a tabla html y mostrar
-        year["y_"+str(selected)] = year["y_"+str(selected)].apply(lambda x: f"{x:,.2f}")
-        crear_tabla(year)
+        colocar_grafico(elementos["grafico"])
+    with col2:                                                          # Tabla html ya construida
+        colocar_tabla(elementos["tabla"])
 
 
 def mostrar_gasto_mensual():
     year_sel = crear_cinta_de_opciones([year for year in range(2012, 2024)])    # Selección de años y meses
     month_sel = crear_cinta_de_opciones(["TODOS"] + [element for element in meses])
+    elementos = render(("mensual", year_sel, month_sel, None, None))
 
-    gasto_mensual = pd.read_csv("Gasto-Mensual/" + str(year_sel) + "-Gasto-Mensual-Por-Region.csv")  # Abrir csv
-
-    if month_sel != "TODOS":                                                    # Mostrar gráfico apilado (año entero)
-        datos_filtrados = gasto_mensual[gasto_mensual['Mes'] == meses[month_sel]]
-        titulo = f"Comparativo de Gasto Mensual por Departamento - Mes {month_sel}"
-
-    else:                                                                       # Mostrar gráfico normal (un mes)
-        datos_filtrados = gasto_mensual
-        titulo = "Comparativo de Gasto Mensual por Departamento (Todos los Meses)"
-
-    if datos_filtrados.empty:                                                   # Verificar que no esté vacío
+    if elementos["grafico"] is None:                                            # Verificar que no esté vacío
         st.warning("No hay datos para la selección realizada.")
         return
 
-    crear_grafico(datos_filtrados, month_sel, titulo, 2)                    # Crear gráfico de barras
+    colocar_grafico(elementos["grafico"])                                       # Gráfico de barras
 
 
 def mostrar_gasto_mensual_region():
     year_sel = crear_cinta_de_opciones([year for year in range(2012, 2024)])    # Selección de años
 
-    gasto_mensual = pd.read_csv("Gasto-Mensual/" + str(year_sel) + "-Gasto-Mensual-Por-Region.csv")  # Abrir csv
     col1, col2, col3 = st.columns([1, 2, 2], gap="medium")                      # Crear columnas
 
     with col1:
         departamento = st.selectbox("Seleccione un departamento", departamentos)    # Selección de departamentos
-
-        temporal = (gasto_mensual[gasto_mensual['Departamento'] == departamento].sort_values('Mes'))    # Filtrado
-        temporal = pd.concat([temporal["Mes"], temporal["Monto"]], axis=1)
-        temporal["Mes"] = temporal["Mes"].apply(lambda x: meses_2[int(x)])
-        temporal["Monto"] = temporal["Monto"].apply(lambda x: f"{x:,.2f}")
-
-        crear_tabla(temporal)                                                   # Mostrar datos filtrados
+        elementos = render(("region", year_sel, None, departamento, None))
+        colocar_tabla(elementos["tabla"])                                       # Mostrar datos filtrados
     with col2:
-        datos_departamento = gasto_mensual[gasto_mensual['Departamento'] == departamento].sort_values(by="Mes")
-
         """Crear gráfico de barras de gasto mensual con colores sólidos"""
-        if datos_departamento.empty:                                            # Verificar que no esté vacío
+        if elementos["barras"] is None:                                         # Verificar que no esté vacío
             st.warning("No hay datos disponibles para el gráfico.")
             return
 
-        crear_grafico(datos_departamento, departamento, f"Gasto Mensual - {departamento}", 3)  # De barras
+        colocar_grafico(elementos["barras"])                                    # De barras
     with col3:
-        crear_grafico(datos_departamento, departamento,
-                      f"Distribución Porcentual del Gasto Mensual - {departamento}", 4)  # Gráfico de pastel
+        colocar_grafico(elementos["pastel"])                                    # Gráfico de pastel
+
+
+def mostrar_desglose():
+    if Cubo.cubo() is None:                                                     # Cubo pre-agregado en memoria
+        st.warning("No hay cubo de gasto. Generarlo con: python Ingesta.py --cubo")
+        return
+
+    year_sel = crear_cinta_de_opciones([year for year in range(2012, 2024)])    # Selección de años
+    col1, col2 = st.columns(2)
+    with col1:
+        dimension = dimensiones[st.selectbox("Desglosar por", list(dimensiones))]
+    with col2:
+        departamento = st.selectbox("Departamento", ["TODOS"] + departamentos)
+    elementos = render(("desglose", year_sel, None, departamento, dimension))
+
+    if elementos["grafico"] is None:                                            # Verificar que no esté vacío
+        st.warning("No hay datos para la selección realizada.")
+        return
+
+    col1, col2 = st.columns([5, 2])
+    with col1:
+        colocar_grafico(elementos["grafico"])
+    with col2:                                                                  # Cantidad de registros y ejecución
+        colocar_tabla(elementos["tabla"])
+
+
+def mostrar_crecimiento():
+    selected = crear_cinta_de_opciones([year for year in range(2013, 2024)])   # Desde el segundo año
+    elementos = render(("crecimiento", selected, None, None, None))
+
+    col1, col2 = st.columns([3, 4])
+    with col1:
+        colocar_grafico(elementos["grafico"])
+    with col2:                                                          # Participación, ranking y avance semestral
+        colocar_tabla(elementos["tabla"])
+
+
+def mostrar_ranking():
+    elementos = render(("ranking", None, None, None, None))
+
+    col1, col2 = st.columns([4, 3])
+    with col1:                                                          # Puesto de cada departamento por año
+        colocar_grafico(elementos["grafico"])
+    with col2:                                                          # Acumulado de todo el periodo
+        colocar_tabla(elementos["tabla"])
@@ -0,0 +1,526 @@
+import os
+import io
+import re
+import math
+import sys
+import time
+import argparse
+import resource
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import Comprimido
+
+# Columnas del archivo <año>-Gastos.csv que realmente se usan en la agregación
+COLUMNA_DEPARTAMENTO = "DEPARTAMENTO_EJECUTORA_NOMBRE"
+COLUMNA_MES = "MES_EJE"
+COLUMNA_MONTO = "MONTO_DEVENGADO"
+
+# Las 63 columnas de <año>-Gastos.csv y sus tipos, como en OLD/obtener_gasto_total.py (d_types).
+# Solo las tres de arriba se leen en la agregación; los demás nombres siguen el formato de datos abiertos del MEF.
+COLUMNAS = ["ANO_EJE", "MES_EJE", "NIVEL_GOBIERNO", "NIVEL_GOBIERNO_NOMBRE", "SECTOR", "SECTOR_NOMBRE", "PLIEGO",
+            "PLIEGO_NOMBRE", "SEC_EJEC", "EJECUTORA", "EJECUTORA_NOMBRE", "DEPARTAMENTO_EJECUTORA",
+            "DEPARTAMENTO_EJECUTORA_NOMBRE", "PROVINCIA_EJECUTORA", "PROVINCIA_EJECUTORA_NOMBRE",
+            "DISTRITO_EJECUTORA", "DISTRITO_EJECUTORA_NOMBRE", "SEC_FUNC", "PROGRAMA_PPTO", "PROGRAMA_PPTO_NOMBRE",
+            "TIPO_ACT_PROY", "TIPO_ACT_PROY_NOMBRE", "PRODUCTO_PROYECTO", "PRODUCTO_PROYECTO_NOMBRE",
+            "ACTIVIDAD_ACCION_OBRA", "ACTIVIDAD_ACCION_OBRA_NOMBRE", "FUNCION", "FUNCION_NOMBRE",
+            "DIVISION_FUNCIONAL", "DIVISION_FUNCIONAL_NOMBRE", "GRUPO_FUNCIONAL", "GRUPO_FUNCIONAL_NOMBRE", "META",
+            "FINALIDAD", "META_NOMBRE", "DEPARTAMENTO_META", "DEPARTAMENTO_META_NOMBRE", "FUENTE_FINANCIAMIENTO",
+            "FUENTE_FINANCIAMIENTO_NOMBRE", "RUBRO", "RUBRO_NOMBRE", "TIPO_RECURSO", "TIPO_RECURSO_NOMBRE",
+            "CATEGORIA_GASTO", "CATEGORIA_GASTO_NOMBRE", "TIPO_TRANSACCION", "GENERICA", "GENERICA_NOMBRE",
+            "SUBGENERICA", "SUBGENERICA_NOMBRE", "SUBGENERICA_DET", "SUBGENERICA_DET_NOMBRE", "ESPECIFICA",
+            "ESPECIFICA_NOMBRE", "ESPECIFICA_DET", "ESPECIFICA_DET_NOMBRE", "SEC_FUNC_META", "MONTO_PIA",
+            "MONTO_PIM", "MONTO_CERTIFICADO", "MONTO_COMPROMETIDO", "MONTO_DEVENGADO", "MONTO_GIRADO"]
+
+D_TYPES = {0: 'int16', 1: 'int8', 2: 'str', 3: 'str', 4: 'str', 5: 'str', 6: 'str', 7: 'str', 8: 'str', 9: 'str',
+           10: 'str', 11: 'str', 12: 'str', 13: 'str', 14: 'str', 15: 'str', 16: 'str', 17: 'int64', 18: 'int64',
+           19: 'str', 20: 'int64', 21: 'str', 22: 'int64', 23: 'str', 24: 'int64', 25: 'str', 26: 'str', 27: 'str',
+           28: 'str', 29: 'str', 30: 'str', 31: 'str', 32: 'str', 33: 'str', 34: 'str', 35: 'str', 36: 'str',
+           37: 'str', 38: 'str', 39: 'str', 40: 'str', 41: 'str', 42: 'str', 43: 'int64', 44: 'str', 45: 'int64',
+           46: 'int64', 47: 'str', 48: 'int64', 49: 'str', 50: 'int64', 51: 'str', 52: 'int64', 53: 'str',
+           54: 'int64', 55: 'str', 56: 'int64', 57: 'float64', 58: 'float64', 59: 'float64', 60: 'float64',
+           61: 'float64', 62: 'float64'}
+
+TAMANO_CHUNK = 524288                   # Filas por parte, el mismo valor que en OLD/obtener_gasto_total.py
+BYTES_POR_RANGO = 512 * 1024 ** 2       # Archivos más grandes se reparten entre varios procesos
+CHUNK_MINIMO = 16384                    # Límites del ajuste automático de filas por parte
+CHUNK_MAXIMO = 8 * 1024 ** 2
+BYTES_MAXRSS = 1 if sys.platform == "darwin" else 1024   # ru_maxrss está en bytes en macOS y en KiB en Linux
+ANIOS = range(2012, 2024)
+CENTIMOS = 100                          # Los montos se acumulan como enteros (céntimos): sumas exactas
+MESES = range(1, 13)                    # MES_EJE 0 es la apertura; debe sumar 0 en el devengado
+MES_TOTAL = -1                          # Filas (departamento, -1) de cada parcial: su total, acumulado aparte
+
+DIRECTORIO_ANUAL = "Gasto-Anual"
+DIRECTORIO_MENSUAL = "Gasto-Mensual"
+DIRECTORIO_CUBO = "Gasto-Cubo"
+
+# Cubo: (departamento, mes) más estas dimensiones, con la suma de cada medida y la cantidad de registros
+DIMENSIONES_CUBO = ["NIVEL_GOBIERNO_NOMBRE", "SECTOR_NOMBRE", "FUNCION_NOMBRE"]
+MEDIDAS_CUBO = ["MONTO_PIA", "MONTO_PIM", COLUMNA_MONTO]
+COLUMNA_CANTIDAD = "CANTIDAD"
+
+
+def ruta_entrada(anio, directorio="."):
+    """Archivo crudo descargado del MEF; si no está el .csv, su versión comprimida (.csv.gz, .csv.zst, .csv.zip)"""
+    ruta = os.path.join(directorio, str(anio) + "-Gastos.csv")
+    for extension in [""] + list(Comprimido.EXTENSIONES):
+        if os.path.exists(ruta + extension):
+            return ruta + extension
+    return ruta
+
+
+def ruta_anual(anio, directorio=DIRECTORIO_ANUAL):
+    return os.path.join(directorio, str(anio) + "-Gasto-Total-Por-Region.csv")
+
+
+def ruta_mensual(anio, directorio=DIRECTORIO_MENSUAL):
+    return os.path.join(directorio, str(anio) + "-Gasto-Mensual-Por-Region.csv")
+
+
+def ruta_cubo(anio, directorio=DIRECTORIO_CUBO):
+    return os.path.join(directorio, str(anio) + "-Cubo.csv.gz")
+
+
+def ruta_combinada(directorio=DIRECTORIO_ANUAL, anios=ANIOS):
+    return os.path.join(directorio, f"Gasto-Anual-{min(anios)}-{max(anios)}.csv")
+
+
+def tipos_compactos(columnas):
+    """Tipos más pequeños a partir de D_TYPES: texto como categoría, enteros pequeños se conservan"""
+    tipos = {}
+    for columna in columnas:
+        tipo = D_TYPES[COLUMNAS.index(columna)] if columna in COLUMNAS else "str"
+        tipos[columna] = "category" if tipo == "str" else tipo
+    return tipos
+
+
+def leer_chunks(entrada, chunksize=TAMANO_CHUNK, cubo=False):
+    """Leer solo las columnas necesarias, en partes: tres, o las del cubo"""
+    columnas = [COLUMNA_DEPARTAMENTO, COLUMNA_MES] + (DIMENSIONES_CUBO + MEDIDAS_CUBO if cubo else [COLUMNA_MONTO])
+    return pd.read_csv(entrada, usecols=columnas, dtype=tipos_compactos(columnas), chunksize=chunksize)
+
+
+def a_centimos(montos):                 # Soles (float, como los lee pandas) → céntimos int64; vacío = 0
+    return np.rint(np.nan_to_num(np.asarray(montos, dtype="float64")) * CENTIMOS).astype("int64")
+
+
+def a_soles(centimos):                  # Céntimos enteros → soles, solo al escribir las tablas
+    return centimos / CENTIMOS
+
+
+def con_totales(parcial, totales):
+    """Agregar al parcial las filas (departamento, MES_TOTAL) con el total de cada departamento sumado sin
+    separar por mes. Se combinan y reducen como cualquier otra fila; en el cubo solo llevan el devengado."""
+    niveles = [totales.index.astype(str), np.full(len(totales), MES_TOTAL, dtype="int8")]
+    niveles += [np.full(len(totales), np.nan, dtype=object)] * (parcial.index.nlevels - 2)
+    indice = pd.MultiIndex.from_arrays(niveles, names=parcial.index.names)
+    if isinstance(parcial, pd.DataFrame):
+        totales = pd.DataFrame(0, index=indice, columns=parcial.columns).assign(**{COLUMNA_MONTO: totales.to_numpy()})
+    return pd.concat([parcial, totales.set_axis(indice)])
+
+
+def verificar_totales(parcial):
+    """Comprobar que los meses 1 a 12 de cada departamento suman exactamente su total (filas MES_TOTAL) y
+    devolver el parcial sin esas filas. Un devengado distinto de 0 en el mes 0 (apertura) descuadra el año."""
+    mes = parcial.index.get_level_values(1)
+    totales = parcial[mes == MES_TOTAL].groupby(level=0).sum()
+    meses = parcial[np.isin(mes, MESES)].groupby(level=0).sum()
+    indice = totales.index.union(meses.index)
+    diferencia = totales.reindex(indice, fill_value=0) - meses.reindex(indice, fill_value=0)
+    descuadre = diferencia[diferencia != 0]
+    if not descuadre.empty:
+        raise ValueError("Los meses 1 a 12 no suman el total anual en: " + ", ".join(
+            f"{departamento} ({a_soles(monto):+,.2f})" for departamento, monto in descuadre.items()))
+    return parcial[mes != MES_TOTAL]
+
+
+def _como_texto(parcial):               # Categorías distintas en cada parte: los niveles se comparan como texto
+    niveles = [nivel.astype(str) if isinstance(nivel, pd.CategoricalIndex) else nivel for nivel in parcial.index.levels]
+    return parcial.set_axis(parcial.index.set_levels(niveles))
+
+
+def agregar_chunk(chunk):
+    """Suma parcial (departamento, mes) → céntimos de una parte, con el total de cada departamento sumado
+    en la misma pasada (ver con_totales); se verifica una sola vez por año, en guardar_anio."""
+    chunk = chunk.assign(**{COLUMNA_MONTO: a_centimos(chunk[COLUMNA_MONTO])})
+    parcial = chunk.groupby([COLUMNA_DEPARTAMENTO, COLUMNA_MES], observed=True)[COLUMNA_MONTO].sum()
+    totales = chunk.groupby(COLUMNA_DEPARTAMENTO, observed=True)[COLUMNA_MONTO].sum()
+    return con_totales(_como_texto(parcial), totales)
+
+
+def agregar_chunk_cubo(chunk):          # Suma de cada medida en céntimos y cantidad de registros por dimensiones
+    chunk = chunk.assign(**{medida: a_centimos(chunk[medida]) for medida in MEDIDAS_CUBO})
+    grupos = chunk.groupby([COLUMNA_DEPARTAMENTO, COLUMNA_MES] + DIMENSIONES_CUBO, observed=True, dropna=False)
+    parcial = grupos[MEDIDAS_CUBO].sum()
+    parcial[COLUMNA_CANTIDAD] = grupos.size()
+    totales = chunk.groupby(COLUMNA_DEPARTAMENTO, observed=True)[COLUMNA_MONTO].sum()
+    return con_totales(_como_texto(parcial), totales)
+
+
+def parcial_de_cubo(cubo):              # Serie (departamento, mes) → monto a partir del cubo, con sus totales
+    return cubo[COLUMNA_MONTO].groupby(level=[0, 1]).sum()
+
+
+def leer_tamano(texto):                 # "2G", "512M", "1.5GB" o bytes → bytes
+    encontrado = re.fullmatch(r"\s*([\d.]+)\s*([KMGT]?)I?B?\s*", str(texto).upper())
+    if not encontrado:
+        raise ValueError("Tamaño no válido: " + str(texto))
+    return int(float(encontrado.group(1)) * 1024 ** " KMGT".index(encontrado.group(2) or " "))
+
+
+def rss_actual():                       # Memoria residente del proceso, en bytes
+    try:
+        with open("/proc/self/statm") as archivo:
+            return int(archivo.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:                                                 # Sin /proc: usar el pico
+        return rss_pico()
+
+
+def rss_pico():
+    """Pico de memoria residente del proceso, en bytes: VmHWM en Linux (se puede reiniciar con reiniciar_pico),
+    si no ru_maxrss, que solo crece"""
+    try:
+        with open("/proc/self/status") as archivo:
+            for linea in archivo:
+                if linea.startswith("VmHWM:"):
+                    return int(linea.split()[1]) * 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * BYTES_MAXRSS
+
+
+def reiniciar_pico():                   # Llevar VmHWM al RSS actual (Linux); False si no se puede
+    try:
+        with open("/proc/self/clear_refs", "w") as archivo:
+            archivo.write("5")
+        return True
+    except OSError:
+        return False
+
+
+class AjusteDeChunk:
+    """Elegir las filas de la siguiente parte según la memoria medida y el rendimiento de las anteriores.
+    El pico se reinicia antes de cada parte, así que la memoria se mide por parte y se modela como un costo
+    fijo (búferes del lector) más un costo por fila, estimados con las dos últimas partes de tamaño distinto.
+    El tamaño crece mientras mejoren las filas por segundo y quepa en el presupuesto; cerca del límite se
+    quitan solo las filas que alcanzan para volver debajo, y con holgura se recupera el mejor tamaño visto."""
+
+    def __init__(self, max_rss, inicial=TAMANO_CHUNK):
+        self.max_rss = max_rss
+        self.base = rss_actual()                                    # Memoria antes de empezar a leer
+        self.filas = min(inicial, self._limite(0, None))
+        self._mejor = 0                                             # Mejor rendimiento observado (filas/s)
+        self._filas_mejor = self.filas                              # Filas de la parte con ese rendimiento
+        self._creciendo = True
+        self._muestras = {}                                         # Filas → memoria pedida por la parte
+        self._reiniciado = False                                    # El pico es solo de la parte en curso
+        self._pico_previo = rss_pico()
+
+    def empezar(self):                  # Antes de leer cada parte
+        self._reiniciado = reiniciar_pico()
+        self._pico_previo = rss_pico()
+
+    def _modelo(self):                  # (bytes fijos, bytes por fila); None por fila si no hay medición
+        *anterior, (filas, memoria) = list(self._muestras.items())[-2:]
+        if not anterior:
+            return 0, memoria / filas if memoria else None
+        otras_filas, otra_memoria = anterior[0]
+        por_fila = max((memoria - otra_memoria) / (filas - otras_filas), 0)
+        return max(memoria - por_fila * filas, 0), por_fila
+
+    def _limite(self, fijo, bytes_por_fila):   # Filas que caben en el 80% del presupuesto libre
+        libre = self.max_rss * 0.8 - self.base - fijo
+        if libre <= 0:                                              # El costo fijo ya lo ocupa: las filas no importan
+            return CHUNK_MAXIMO
+        if bytes_por_fila is None:                                  # Estimación inicial: ~200 bytes por fila
+            bytes_por_fila = 200
+        return int(max(CHUNK_MINIMO, min(CHUNK_MAXIMO, libre / max(bytes_por_fila, 1))))
+
+    def siguiente(self, filas, segundos):
+        if filas == 0:
+            return self.filas
+        pico = rss_pico()
+        self._muestras.pop(filas, None)                             # La más reciente queda al final
+        self._muestras[filas] = max(pico - self._pico_previo, 0)
+        fijo, por_fila = self._modelo()
+        limite = self._limite(fijo, por_fila)
+        rendimiento = filas / max(segundos, 1e-9)
+        uso = pico if self._reiniciado else rss_actual()            # Sin reinicio el pico no baja nunca
+        exceso = uso - self.max_rss * 0.9
+        recuperado = min(int(self.filas * 1.5), self._filas_mejor, limite)
+
+        if exceso > 0:                                              # Cerca del límite: quitar las filas que sobran
+            self._creciendo = False
+            if por_fila is not None and por_fila * (filas - CHUNK_MINIMO) > exceso:
+                self.filas = max(CHUNK_MINIMO, min(self.filas, int(filas - exceso / por_fila), limite))
+            else:                                                   # Ni con el mínimo se baja: achicar no ayuda
+                self.filas = min(max(self.filas, self._filas_mejor), limite)
+        elif self._creciendo and rendimiento > self._mejor * 1.05:  # Sigue mejorando: crecer
+            self._mejor, self._filas_mejor = rendimiento, self.filas
+            self.filas = min(int(self.filas * 1.5), limite)
+        elif recuperado > self.filas and uso + (recuperado - filas) * (por_fila or 0) < self.max_rss * 0.9:
+            self.filas = recuperado                                 # Holgura: volver hacia el mejor tamaño
+        else:
+            self._creciendo = False
+            if rendimiento > self._mejor:
+                self._mejor, self._filas_mejor = rendimiento, self.filas
+            self.filas = min(self.filas, limite)
+        return self.filas
+
+
+def combinar_parciales(acumulado, parcial):
+    """Combinar dos sumas parciales alineando índices, sin recorrer en Python. Se alinea con reindex para que
+    los céntimos sigan siendo int64 (add con fill_value pasaría por float64)."""
+    if acumulado is None:
+        return parcial
+    indice = acumulado.index.union(parcial.index)
+    return acumulado.reindex(indice, fill_value=0) + parcial.reindex(indice, fill_value=0)
+
+
+def _partes(lector, ajuste):            # Partes de tamaño fijo, o ajustado tras cada parte si hay presupuesto
+    if ajuste is None:
+        yield from lector
+        return
+    while True:
+        ajuste.empezar()
+        inicio = time.perf_counter()
+        try:
+            chunk = lector.get_chunk(ajuste.filas)
+        except StopIteration:
+            return
+        yield chunk
+        ajuste.siguiente(len(chunk), time.perf_counter() - inicio)
+
+
+def agregar_archivo(entrada, chunksize=TAMANO_CHUNK, verbose=True, max_rss=None, cubo=False):
+    """Recorrer una sola vez el archivo crudo y devolver la serie (departamento, mes) → céntimos con las filas de
+    totales (ver con_totales), o con cubo=True el DataFrame del cubo (ver DIMENSIONES_CUBO). Con max_rss (bytes)
+    las filas por parte se ajustan solas para no superar ese presupuesto."""
+    acumulado = None
+    contador = 1                                                    # Número de parte
+    ajuste = AjusteDeChunk(max_rss, chunksize) if max_rss else None
+    agregar = agregar_chunk_cubo if cubo else agregar_chunk
+
+    with Comprimido.abrir(entrada) as flujo, \
+            leer_chunks(flujo, chunksize if ajuste is None else ajuste.filas, cubo) as lector:
+        for chunk in _partes(lector, ajuste):
+            acumulado = combinar_parciales(acumulado, agregar(chunk))
+            if verbose:
+                print("Parte " + str(contador) + " completado.")    # Indicar al usuario el avance
+            contador += 1
+
+    if acumulado is None:                                           # Archivo sin filas
+        return _parcial_vacio(cubo)
+    return acumulado
+
+
+def _parcial_vacio(cubo=False):
+    claves = [COLUMNA_DEPARTAMENTO, COLUMNA_MES] + (DIMENSIONES_CUBO if cubo else [])
+    indice = pd.MultiIndex.from_arrays([[] for _ in claves], names=claves)
+    if cubo:
+        return pd.DataFrame({columna: pd.Series([], dtype="int64") for columna in MEDIDAS_CUBO + [COLUMNA_CANTIDAD]},
+                            index=indice)
+    return pd.Series([], dtype="int64", index=indice)
+
+
+def reducir_parciales(parciales):       # Reducir varias sumas parciales de un mismo año en una sola operación
+    no_vacios = [parcial for parcial in parciales if not parcial.empty]
+    if not no_vacios:
+        return parciales[0] if parciales else _parcial_vacio()
+    return pd.concat(no_vacios).groupby(level=list(range(no_vacios[0].index.nlevels)), dropna=False).sum()
+
+
+class _RangoDeArchivo(io.RawIOBase):
+    """Vista de solo lectura de los bytes [inicio, fin) de un archivo, precedida por la cabecera"""
+
+    def __init__(self, entrada, inicio, fin, cabecera):
+        super().__init__()
+        self._archivo = open(entrada, "rb")
+        self._archivo.seek(inicio)
+        self._restante = fin - inicio
+        self._cabecera = cabecera
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if self._cabecera:                                          # Primero entregar la cabecera
+            n = min(len(buffer), len(self._cabecera))
+            buffer[:n] = self._cabecera[:n]
+            self._cabecera = self._cabecera[n:]
+            return n
+
+        datos = self._archivo.read(min(len(buffer), self._restante))
+        n = len(datos)
+        buffer[:n] = datos
+        self._restante -= n
+        return n
+
+    def close(self):
+        self._archivo.close()
+        super().close()
+
+
+def rangos_de_bytes(entrada, partes):
+    """Dividir el archivo en rangos de bytes que empiezan y terminan en un salto de línea.
+    Se asume que ningún campo entre comillas contiene saltos de línea, como en los archivos del MEF.
+    Un archivo comprimido no se puede recorrer desde el medio: es un solo rango, el archivo entero."""
+    tamano = os.path.getsize(entrada)
+    if Comprimido.formato(entrada):
+        return b"", [(0, tamano)]
+    with open(entrada, "rb") as archivo:
+        cabecera = archivo.readline()
+        limites = [archivo.tell()]
+        for i in range(1, partes):
+            posicion = limites[0] + (tamano - limites[0]) * i // partes
+            archivo.seek(max(posicion - 1, limites[-1]))
+            archivo.readline()                                      # Avanzar hasta el siguiente inicio de línea
+            if limites[-1] < archivo.tell() < tamano:
+                limites.append(archivo.tell())
+        limites.append(tamano)
+    return cabecera, list(zip(limites[:-1], limites[1:]))
+
+
+def agregar_rango(entrada, inicio, fin, cabecera, chunksize=TAMANO_CHUNK, max_rss=None, cubo=False):
+    """Trabajo de un proceso: suma parcial de un rango de bytes del archivo"""
+    if Comprimido.formato(entrada):                                 # Único rango de rangos_de_bytes
+        return agregar_archivo(entrada, chunksize, verbose=False, max_rss=max_rss, cubo=cubo)
+    with io.BufferedReader(_RangoDeArchivo(entrada, inicio, fin, cabecera)) as rango:
+        return agregar_archivo(rango, chunksize, verbose=False, max_rss=max_rss, cubo=cubo)
+
+
+def _partes_del_archivo(entrada, bytes_por_rango):
+    if Comprimido.formato(entrada):
+        return 1
+    return max(1, math.ceil(os.path.getsize(entrada) / bytes_por_rango))
+
+
+def tabla_mensual(parcial):             # Mismo formato que Gasto-Mensual/<año>-Gasto-Mensual-Por-Region.csv
+    tabla = a_soles(parcial).rename("Monto").rename_axis(["Departamento", "Mes"]).reset_index()
+    tabla = tabla[(tabla["Departamento"].str.strip() != "") & (tabla["Mes"] != 0)]
+    return tabla.sort_values(by=["Departamento", "Mes"]).reset_index(drop=True)
+
+
+def tabla_anual(parcial):               # Mismo formato que Gasto-Anual/<año>-Gasto-Total-Por-Region.csv
+    total = a_soles(parcial.groupby(level=0).sum())
+    tabla = total.rename("Gasto_Total").rename_axis("Departamento").reset_index()
+    tabla = tabla[tabla["Departamento"].str.strip() != ""]
+    return tabla.sort_values(by="Departamento").reset_index(drop=True)
+
+
+def tabla_combinada(anuales):
+    """Tabla ancha Departamento, y_2012, ..., y_2023 a partir de las tablas anuales"""
+    columnas = {"y_" + str(anio): tabla.set_index("Departamento")["Gasto_Total"]
+                for anio, tabla in sorted(anuales.items())}
+    combinada = pd.DataFrame(columnas).rename_axis("Departamento").sort_index().reset_index()
+    return combinada
+
+
+def guardar_anio(anio, parcial, dir_anual=DIRECTORIO_ANUAL, dir_mensual=DIRECTORIO_MENSUAL):
+    """Verificar los totales del año (cualquiera sea el camino que lo agregó) y escribir sus tablas"""
+    parcial = verificar_totales(parcial)
+    anual = tabla_anual(parcial)
+    tabla_mensual(parcial).to_csv(ruta_mensual(anio, dir_mensual), index=False)
+    anual.to_csv(ruta_anual(anio, dir_anual), index=False)
+    return anual
+
+
+def guardar_cubo(anio, cubo, dir_cubo=DIRECTORIO_CUBO):
+    os.makedirs(dir_cubo, exist_ok=True)
+    cubo = cubo[cubo.index.get_level_values(1) != MES_TOTAL]
+    tabla = cubo.assign(**{medida: a_soles(cubo[medida]) for medida in MEDIDAS_CUBO})
+    tabla = tabla.rename_axis(["Departamento", "Mes"] + DIMENSIONES_CUBO).reset_index()
+    tabla[tabla["Departamento"].str.strip() != ""].to_csv(ruta_cubo(anio, dir_cubo), index=False)
+
+
+def _guardar_resultado(anio, resultado, cubo, dir_anual, dir_mensual, dir_cubo=DIRECTORIO_CUBO):
+    """Guardar las salidas de un año; con cubo, la serie (departamento, mes) se obtiene del mismo cubo
+    y se verifica antes de escribirlo"""
+    anual = guardar_anio(anio, parcial_de_cubo(resultado) if cubo else resultado, dir_anual, dir_mensual)
+    if cubo:
+        guardar_cubo(anio, resultado, dir_cubo)
+    return anual
+
+
+def guardar_combinada(anuales, anios=ANIOS, dir_anual=DIRECTORIO_ANUAL):
+    """Completar con los años ya guardados en disco y escribir Gasto-Anual-<inicio>-<fin>.csv"""
+    anuales = dict(anuales)
+    for anio in anios:
+        if anio not in anuales and os.path.exists(ruta_anual(anio, dir_anual)):
+            anuales[anio] = pd.read_csv(ruta_anual(anio, dir_anual))
+
+    combinada = tabla_combinada(anuales)
+    combinada.to_csv(ruta_combinada(dir_anual, anuales.keys()))   # Con índice, igual que el archivo original
+    return combinada
+
+
+def procesar_anios(anios=ANIOS, entrada=".", dir_anual=DIRECTORIO_ANUAL, dir_mensual=DIRECTORIO_MENSUAL,
+                   chunksize=TAMANO_CHUNK, trabajadores=1, bytes_por_rango=BYTES_POR_RANGO, max_rss=None, cubo=False,
+                   dir_cubo=DIRECTORIO_CUBO):
+    """Generar las salidas anual, mensual y combinada con una sola lectura de cada archivo.
+    max_rss es el presupuesto de memoria total; en paralelo se reparte entre los procesos.
+    Con cubo=True, la misma lectura genera además <dir_cubo>/<año>-Cubo.csv.gz."""
+    if trabajadores > 1:
+        anuales = _procesar_en_paralelo(anios, entrada, dir_anual, dir_mensual, chunksize, trabajadores,
+                                        bytes_por_rango, max_rss and max_rss // (trabajadores + 1), cubo, dir_cubo)
+    else:
+        anuales = {}
+        for anio in anios:
+            resultado = agregar_archivo(ruta_entrada(anio, entrada), chunksize, max_rss=max_rss, cubo=cubo)
+            anuales[anio] = _guardar_resultado(anio, resultado, cubo, dir_anual, dir_mensual, dir_cubo)
+            print("Archivo " + ruta_entrada(anio, entrada) + " procesado exitosamente.")
+
+    return guardar_combinada(anuales, sorted(set(ANIOS) | set(anuales)), dir_anual)
+
+
+def _procesar_en_paralelo(anios, entrada, dir_anual, dir_mensual, chunksize, trabajadores, bytes_por_rango,
+                          max_rss=None, cubo=False, dir_cubo=DIRECTORIO_CUBO):
+    """Repartir años y rangos de un mismo año entre procesos; cada año se guarda al completar sus rangos"""
+    anuales = {}
+    pendientes = {}                                                 # Año → rangos que faltan terminar
+    parciales = {}                                                  # Año → sumas parciales recibidas
+
+    with ProcessPoolExecutor(max_workers=trabajadores) as executor:
+        futuros = {}
+        for anio in anios:
+            archivo = ruta_entrada(anio, entrada)
+            cabecera, rangos = rangos_de_bytes(archivo, _partes_del_archivo(archivo, bytes_por_rango))
+            pendientes[anio] = len(rangos)
+            parciales[anio] = []
+            for inicio, fin in rangos:
+                futuros[executor.submit(agregar_rango, archivo, inicio, fin, cabecera, chunksize, max_rss,
+                                        cubo)] = anio
+
+        for futuro in as_completed(futuros):
+            anio = futuros[futuro]
+            parciales[anio].append(futuro.result())
+            pendientes[anio] -= 1
+            if pendientes[anio] == 0:                               # Todos los rangos del año terminados
+                anuales[anio] = _guardar_resultado(anio, reducir_parciales(parciales.pop(anio)), cubo, dir_anual,
+                                                   dir_mensual, dir_cubo)
+                print("Archivo " + ruta_entrada(anio, entrada) + " procesado exitosamente.")
+
+    return anuales
+
+
+def _argumentos():
+    parser = argparse.ArgumentParser(description="Obtener el gasto anual y mensual por departamento")
+    parser.add_argument("--desde", type=int, default=min(ANIOS), help="Primer año a procesar")
+    parser.add_argument("--hasta", type=int, default=max(ANIOS), help="Último año a procesar")
+    parser.add_argument("--entrada", default=".", help="Carpeta con los archivos <año>-Gastos.csv")
+    parser.add_argument("--chunksize", type=int, default=TAMANO_CHUNK, help="Filas por parte")
+    parser.add_argument("--trabajadores", type=int, default=1, help="Procesos en paralelo (1 = secuencial)")
+    parser.add_argument("--bytes-por-rango", type=int, default=BYTES_POR_RANGO,
+                        help="Tamaño máximo de cada rango en que se divide un archivo grande")
+    parser.add_argument("--max-rss", type=leer_tamano, help="Presupuesto de memoria, p. ej. 2G; ajusta el chunksize")
+    parser.add_argument("--cubo", action="store_true", help="Generar también el cubo por nivel, sector y función")
+    parser.add_argument("--dir-cubo", default=DIRECTORIO_CUBO, help="Carpeta donde guardar el cubo")
+    return parser
+
+
+if __name__ == "__main__":
+    args = _argumentos().parse_args()
+    procesar_anios(range(args.desde, args.hasta + 1), args.entrada, chunksize=args.chunksize,
+                   trabajadores=args.trabajadores, bytes_por_rango=args.bytes_por_rango, max_rss=args.max_rss,
+                   cubo=args.cubo, dir_cubo=args.dir_cubo)
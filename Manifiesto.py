@@ -0,0 +1,173 @@
+import os
+import re
+import json
+import hashlib
+import argparse
+import pandas as pd
+import Ingesta
+import Descarga
+
+RUTA_MANIFIESTO = "manifiesto.json"
+BYTES_POR_PUNTO_DE_CONTROL = 256 * 1024 ** 2   # Cada cuántos bytes procesados se guarda el avance de un año
+BLOQUE_SHA256 = 8 * 1024 ** 2
+UNIDAD = "centimos-con-totales"         # Formato de las sumas parciales guardadas; otro obliga a reprocesar
+
+
+def cargar(ruta=RUTA_MANIFIESTO):
+    if not os.path.exists(ruta):
+        return {"anios": {}, "combinada": {}}
+    with open(ruta, encoding="utf-8") as archivo:
+        return json.load(archivo)
+
+
+def guardar(manifiesto, ruta=RUTA_MANIFIESTO):  # Escribir en un temporal y reemplazar, para no dejarlo a medias
+    temporal = ruta + ".tmp"
+    with open(temporal, "w", encoding="utf-8") as archivo:
+        json.dump(manifiesto, archivo, indent=2, ensure_ascii=False)
+    os.replace(temporal, ruta)
+
+
+def sha256(ruta):
+    resumen = hashlib.sha256()
+    with open(ruta, "rb") as archivo:
+        for bloque in iter(lambda: archivo.read(BLOQUE_SHA256), b""):
+            resumen.update(bloque)
+    return resumen.hexdigest()
+
+
+def huella(ruta, anterior=None):
+    """Tamaño, fecha de modificación y checksum; el checksum solo se recalcula si cambió el tamaño o la fecha"""
+    estado = os.stat(ruta)
+    actual = {"tamano": estado.st_size, "modificado": estado.st_mtime}
+    if anterior and all(anterior.get(clave) == valor for clave, valor in actual.items()):
+        actual["sha256"] = anterior["sha256"]
+    else:
+        actual["sha256"] = sha256(ruta)
+    return actual
+
+
+def _misma_huella(registro, actual):
+    return registro.get("sha256") == actual["sha256"] and registro.get("tamano") == actual["tamano"]
+
+
+def _parcial_a_lista(parcial):          # Serie (departamento, mes) → céntimos en JSON, con las filas de totales
+    return [[departamento, int(mes), int(monto)] for (departamento, mes), monto in parcial.items()]
+
+
+def _lista_a_parcial(lista):
+    if not lista:
+        return Ingesta.reducir_parciales([])
+    departamento, mes, monto = zip(*lista)
+    indice = pd.MultiIndex.from_arrays([list(departamento), pd.array(mes, dtype="int8")],
+                                       names=[Ingesta.COLUMNA_DEPARTAMENTO, Ingesta.COLUMNA_MES])
+    return pd.Series(monto, index=indice, dtype="int64")
+
+
+def _salidas_completas(registro):
+    return all(os.path.exists(ruta) for ruta in registro.get("salidas", {}).values())
+
+
+def procesar_anio(anio, manifiesto, entrada=".", dir_anual=Ingesta.DIRECTORIO_ANUAL,
+                  dir_mensual=Ingesta.DIRECTORIO_MENSUAL, ruta_manifiesto=RUTA_MANIFIESTO,
+                  chunksize=Ingesta.TAMANO_CHUNK, bytes_por_punto=BYTES_POR_PUNTO_DE_CONTROL):
+    """Procesar un año por rangos de bytes, guardando en el manifiesto la suma parcial tras cada rango.
+    Devuelve la tabla anual, o None si el año no cambió desde la última ejecución."""
+    archivo = Ingesta.ruta_entrada(anio, entrada)
+    if not os.path.exists(archivo):
+        print("No se encontró " + archivo + ", se omite.")
+        return None
+    registro = manifiesto["anios"].get(str(anio), {})
+    actual = huella(archivo, registro)
+
+    en_proceso = registro.get("estado") != "completo"
+    if (not _misma_huella(registro, actual) or registro.get("unidad") != UNIDAD     # Nuevo, cambiado o en otro formato
+            or en_proceso and registro.get("bytes_por_punto") != bytes_por_punto):  # Otros rangos: no reanudar
+        registro = {"entrada": archivo, **actual, "unidad": UNIDAD, "bytes_por_punto": bytes_por_punto,
+                    "estado": "en_proceso", "offsets": [], "parcial": []}
+    elif registro.get("estado") == "completo" and _salidas_completas(registro):
+        print("Año " + str(anio) + " sin cambios, se omite.")
+        return None
+    elif registro.get("estado") == "completo":                      # Faltan salidas: se regeneran desde el parcial
+        return Ingesta.guardar_anio(anio, _lista_a_parcial(registro["parcial"]), dir_anual, dir_mensual)
+    registro.update(actual)
+
+    cabecera, rangos = Ingesta.rangos_de_bytes(archivo, Ingesta._partes_del_archivo(archivo, bytes_por_punto))
+    hechos = set(registro["offsets"])
+    parcial = _lista_a_parcial(registro["parcial"])
+    if hechos:
+        print("Año " + str(anio) + ": continuando desde el byte " + str(max(hechos)) + ".")
+
+    for inicio, fin in rangos:
+        if fin in hechos:                                           # Rango terminado en una ejecución anterior
+            continue
+        parcial = Ingesta.reducir_parciales([parcial, Ingesta.agregar_rango(archivo, inicio, fin, cabecera,
+                                                                            chunksize)])
+        registro["offsets"].append(fin)
+        registro["parcial"] = _parcial_a_lista(parcial)
+        manifiesto["anios"][str(anio)] = registro
+        guardar(manifiesto, ruta_manifiesto)                        # Punto de control
+        print("Año " + str(anio) + ": " + str(fin) + " de " + str(actual["tamano"]) + " bytes.")
+
+    anual = Ingesta.guardar_anio(anio, parcial, dir_anual, dir_mensual)
+    registro["estado"] = "completo"
+    registro["salidas"] = {"anual": Ingesta.ruta_anual(anio, dir_anual),
+                           "mensual": Ingesta.ruta_mensual(anio, dir_mensual)}
+    manifiesto["anios"][str(anio)] = registro
+    guardar(manifiesto, ruta_manifiesto)
+    return anual
+
+
+def leer_enlaces(ruta="OLD/enlaces.txt"):
+    """Año → enlace; el año se toma del nombre del archivo, o por posición desde 2012"""
+    with open(ruta, "r", encoding="utf-8") as archivo:
+        enlaces = archivo.read().split()
+    anios = {}
+    for posicion, enlace in enumerate(enlaces):
+        encontrado = re.search(r"(\d{4})-Gasto", enlace)
+        anios[int(encontrado.group(1)) if encontrado else min(Ingesta.ANIOS) + posicion] = enlace
+    return anios
+
+
+def descargar_faltantes(enlaces, entrada=".", trabajadores=Descarga.TRABAJADORES):
+    """Solo se descargan los años que no están en disco; un .part pendiente se continúa"""
+    Descarga.descargar_varios(enlaces, entrada, trabajadores)
+
+
+def actualizar(anios, entrada=".", dir_anual=Ingesta.DIRECTORIO_ANUAL, dir_mensual=Ingesta.DIRECTORIO_MENSUAL,
+               ruta_manifiesto=RUTA_MANIFIESTO, chunksize=Ingesta.TAMANO_CHUNK,
+               bytes_por_punto=BYTES_POR_PUNTO_DE_CONTROL):
+    """Procesar solo los años nuevos, modificados o interrumpidos y reconstruir la tabla combinada si hace falta"""
+    manifiesto = cargar(ruta_manifiesto)
+    anuales = {}
+    for anio in anios:
+        anual = procesar_anio(anio, manifiesto, entrada, dir_anual, dir_mensual, ruta_manifiesto, chunksize,
+                              bytes_por_punto)
+        if anual is not None:
+            anuales[anio] = anual
+
+    todos = sorted(set(Ingesta.ANIOS) | set(int(anio) for anio in manifiesto["anios"]) | set(anios))
+    todos = [anio for anio in todos if anio in anuales or os.path.exists(Ingesta.ruta_anual(anio, dir_anual))]
+    combinada = Ingesta.ruta_combinada(dir_anual, todos)
+    if anuales or not os.path.exists(combinada) or manifiesto["combinada"].get("anios") != todos:
+        Ingesta.guardar_combinada(anuales, todos, dir_anual)
+        manifiesto["combinada"] = {"ruta": combinada, "anios": todos}
+        guardar(manifiesto, ruta_manifiesto)
+        print("Tabla combinada " + combinada + " actualizada.")
+    return anuales
+
+
+def _argumentos():
+    parser = argparse.ArgumentParser(description="Actualización incremental del gasto anual y mensual")
+    parser.add_argument("--enlaces", default="OLD/enlaces.txt", help="Archivo con un enlace por año")
+    parser.add_argument("--entrada", default=".", help="Carpeta con los archivos <año>-Gastos.csv")
+    parser.add_argument("--manifiesto", default=RUTA_MANIFIESTO, help="Archivo JSON con el trabajo realizado")
+    parser.add_argument("--sin-descarga", action="store_true", help="Usar solo los archivos ya descargados")
+    return parser
+
+
+if __name__ == "__main__":
+    args = _argumentos().parse_args()
+    enlaces = leer_enlaces(args.enlaces)
+    if not args.sin_descarga:
+        descargar_faltantes(enlaces, args.entrada)
+    actualizar(sorted(enlaces), args.entrada, ruta_manifiesto=args.manifiesto)
@@ -1,27 +1,36 @@
 import streamlit as st
 import pandas as pd
+import os
 import json
 import folium
 import Graphics
+import Datos
+import Geometria
+import Perfil
 from io import BytesIO
+from jinja2 import Template
+from branca.element import MacroElement
+from folium.elements import JSCSSMixin
 
 # Cargar archivos CSV
-file = open("Other/colores.csv", "r")
-colores = {}
-for line in file:
-    line = line.split(",")
-    colores[line[0]] = line[1].split("\n")[0]
-
-file = open("Other/coordenadas.csv", "r")
-coordenadas = {}
-for line in file:
-    line = line.split(",")
-    coordenadas[line[0]] = [float(line[1]), float(line[2].split("\n")[0])]
+with open("Other/colores.csv", "r") as file:
+    colores = {}
+    for line in file:
+        line = line.split(",")
+        colores[line[0]] = line[1].split("\n")[0]
+
+with open("Other/coordenadas.csv", "r") as file:
+    coordenadas = {}
+    for line in file:
+        line = line.split(",")
+        coordenadas[line[0]] = [float(line[1]), float(line[2].split("\n")[0])]
 
 # Cargar información de regiones
+@st.cache_resource
 def cargar_informacion_regiones():
     try:
-        info_regiones = pd.read_csv("Other/informacion_de_region.csv")
+        with Perfil.tramo("carga", "informacion_de_region.csv"):
+            info_regiones = pd.read_csv("Other/informacion_de_region.csv")
         return dict(zip(info_regiones['Region'], info_regiones['Informacion']))
     except Exception as e:
         print(f"Error al cargar información de regiones: {e}")
@@ -97,28 +106,201 @@ def _add_department_to_map(map_obj, feature, line_color, weight, name, gastos, y
 def create_map(geojson_data, gastos, info_regiones, selected_departamento=None):
     year = Graphics.crear_cinta_de_opciones([year for year in range(2012, 2024)])  # Selección de años
 
-    m = folium.Map(location=[-9.19, -75.015], zoom_start=5)  # Inicializar mapa apuntando al Perú
+    with Perfil.tramo("construccion", "mapa folium"):
+        m = folium.Map(location=[-9.19, -75.015], zoom_start=5)  # Inicializar mapa apuntando al Perú
 
-    for feature in geojson_data["features"]:
-        dep_name = feature['properties']['NOMBDEP']
-        name = "PROVINCIA CONSTITUCIONAL DEL CALLAO" if dep_name == "CALLAO" else dep_name
+        for feature in geojson_data["features"]:
+            dep_name = feature['properties']['NOMBDEP']
+            name = "PROVINCIA CONSTITUCIONAL DEL CALLAO" if dep_name == "CALLAO" else dep_name
 
-        line_color = "gray" if dep_name == selected_departamento else "blue"
-        weight = 4 if dep_name == selected_departamento else 2
+            line_color = "gray" if dep_name == selected_departamento else "blue"
+            weight = 4 if dep_name == selected_departamento else 2
 
-        _add_department_to_map(m, feature, line_color, weight, name, gastos, year, info_regiones)
+            _add_department_to_map(m, feature, line_color, weight, name, gastos, year, info_regiones)
 
-    map_html = BytesIO()
-    m.save(map_html, close_file=False)
-    map_html.seek(0)
+    return _guardar_html(m)
+
+def _guardar_html(m):                   # Serializar el mapa (m.save) en memoria
+    with Perfil.tramo("serializacion", "mapa html"):
+        map_html = BytesIO()
+        m.save(map_html, close_file=False)
+        map_html.seek(0)
     return map_html
 
-def render_map():
+@st.cache_resource
+def cargar_geojson():                   # Límites departamentales, una sola lectura por proceso
+    with Perfil.tramo("carga", "geojson"), open("Other/peru_departamental_simple.geojson", "r") as archivo:
+        return json.load(archivo)
+
+class _SelectorDeAnio(MacroElement):
+    """Control de Leaflet que cambia el año de los popups en el navegador, sin volver a Streamlit"""
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+        (function() {
+            var capa = {{ this.capa.get_name() }};
+            function contenido(p, anio) {
+                return "<div style='width: 300px;'><h4>" + p.nombre + "</h4>" +
+                       "<p><strong>Gasto en " + anio + ": S/ " + p.gastos[anio] + "</strong></p>" +
+                       "<p>" + p.informacion + "</p></div>";
+            }
+            var actual = "{{ this.anios[0] }}";
+            function mostrar(anio) {
+                actual = anio;
+                capa.eachLayer(function(l) { l.bindPopup(contenido(l.feature.properties, anio), {maxWidth: 300}); });
+            }
+            capa.on("layeradd", function(e) {       // Departamentos redibujados al cambiar el nivel de detalle
+                e.layer.bindPopup(contenido(e.layer.feature.properties, actual), {maxWidth: 300});
+            });
+            var control = L.control({position: "topright"});
+            control.onAdd = function() {
+                var div = L.DomUtil.create("div", "leaflet-bar");
+                var select = L.DomUtil.create("select", "", div);
+                select.style.fontSize = "16px";
+                {{ this.anios | tojson }}.forEach(function(anio) { select.add(new Option(anio, anio)); });
+                L.DomEvent.disableClickPropagation(div);
+                L.DomEvent.on(select, "change", function() { mostrar(select.value); });
+                return div;
+            };
+            control.addTo({{ this._parent.get_name() }});
+            mostrar("{{ this.anios[0] }}");
+        })();
+        {% endmacro %}
+    """)
+
+    def __init__(self, capa, anios):
+        super().__init__()
+        self._name = "SelectorDeAnio"
+        self.capa = capa
+        self.anios = [str(anio) for anio in anios]
+
+class _CapaTopoJson(JSCSSMixin, MacroElement):
+    """Capa de departamentos desde el TopoJSON cuantizado de Geometria.py; el nivel de detalle se elige
+    en el navegador según el zoom y sus arcos se arman, la primera vez, con los puntos que conserva"""
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+        var {{ this.get_name() }} = L.geoJson(null, {
+            style: function(f) {
+                return {fillColor: f.properties.color, weight: 2, opacity: 1, color: "blue", fillOpacity: 0.5};
+            },
+            onEachFeature: function(f, l) {
+                l.on({
+                    mouseover: function(e) { e.target.setStyle({weight: 3, color: "blue"}); },
+                    mouseout: function(e) { {{ this.get_name() }}.resetStyle(e.target); }
+                });
+            }
+        }).addTo({{ this._parent.get_name() }});
+        (function() {
+            var capa = {{ this.get_name() }}, mapa = {{ this._parent.get_name() }};
+            var topologia = {{ this.topologia | tojson }};
+            var niveles = topologia.niveles.concat([{zoom_max: Infinity, arcs: topologia.arcs}]);
+            var decodificados = {}, actual = null;
+            function arcos(nivel) {     // Índices delta de los puntos conservados → arcos delta de TopoJSON
+                return nivel.arcs || topologia.arcs.map(function(arco, k) {
+                    var x = 0, y = 0, i = 0, px = 0, py = 0;
+                    var absolutos = arco.map(function(p) { x += p[0]; y += p[1]; return [x, y]; });
+                    return nivel.conservar[k].map(function(d) {
+                        var p = absolutos[i += d], r = [p[0] - px, p[1] - py];
+                        px = p[0]; py = p[1];
+                        return r;
+                    });
+                });
+            }
+            function dibujar() {
+                var i = 0;
+                while (mapa.getZoom() > niveles[i].zoom_max) { i++; }
+                if (i === actual) { return; }
+                actual = i;
+                if (!(i in decodificados)) {
+                    var variante = Object.assign({}, topologia, {arcs: arcos(niveles[i])});
+                    decodificados[i] = topojson.feature(variante, topologia.objects.{{ this.objeto }});
+                }
+                capa.clearLayers();
+                capa.addData(decodificados[i]);
+            }
+            mapa.on("zoomend", dibujar);
+            dibujar();
+        })();
+        {% endmacro %}
+    """)
+
+    default_js = [("topojson", "https://cdnjs.cloudflare.com/ajax/libs/topojson/1.6.9/topojson.min.js")]
+
+    def __init__(self, topologia, objeto):
+        super().__init__()
+        self._name = "CapaTopoJson"
+        self.topologia = topologia
+        self.objeto = objeto
+
+def _propiedades(dep_name, almacen, info_regiones):   # Propiedades de un departamento para el mapa unificado
+    name = "PROVINCIA CONSTITUCIONAL DEL CALLAO" if dep_name == "CALLAO" else dep_name
+    return {
+        "NOMBDEP": dep_name,
+        "nombre": name,
+        "color": colores.get(name, "#808080"),
+        "informacion": info_regiones.get(name, "Información no disponible"),
+        "gastos": {str(year): _format_large_number(int(almacen.total(year, name))) for year in almacen.anios}
+    }
+
+def create_map_unificado(geojson_data, almacen, info_regiones, topologia=None):
+    """Una sola capa con el gasto de todos los años en las propiedades de cada departamento;
+    el año se elige en el navegador. Con topologia (ver Geometria.py) se usa el TopoJSON compacto."""
+    m = folium.Map(location=[-9.19, -75.015], zoom_start=5)  # Inicializar mapa apuntando al Perú
+
+    if topologia is not None:
+        objeto = topologia["objects"][Geometria.OBJETO]
+        geometrias = [{**geometria, "properties": _propiedades(geometria["properties"]["NOMBDEP"], almacen,
+                                                                info_regiones)}
+                      for geometria in objeto["geometries"]]
+        topologia = {**topologia, "objects": {Geometria.OBJETO: {**objeto, "geometries": geometrias}}}
+        capa = _CapaTopoJson(topologia, Geometria.OBJETO)
+        m.add_child(capa)
+    else:
+        features = [{"type": "Feature", "geometry": feature["geometry"],
+                     "properties": _propiedades(feature['properties']['NOMBDEP'], almacen, info_regiones)}
+                    for feature in geojson_data["features"]]
+        capa = folium.GeoJson(
+            {"type": "FeatureCollection", "features": features},
+            style_function=lambda feature: {
+                'fillColor': feature['properties']['color'],
+                'weight': 2,
+                'opacity': 1,
+                'color': "blue",
+                'fillOpacity': 0.5
+            },
+            highlight_function=lambda x: {'weight': 3, 'color': 'blue'},
+            name="Departamento"
+        ).add_to(m)
+    m.add_child(_SelectorDeAnio(capa, almacen.anios))
+    return _guardar_html(m)
+
+@st.cache_resource
+def cargar_topologia():                 # TopoJSON generado con Geometria.py; None si no existe
+    if not os.path.exists(Geometria.RUTA_TOPOJSON):
+        return None
+    with Perfil.tramo("carga", "topojson"), open(Geometria.RUTA_TOPOJSON, "r") as archivo:
+        return json.load(archivo)
+
+@st.cache_resource
+def mapa_unificado_html():              # Se construye una sola vez por proceso y se comparte entre sesiones
+    topologia = cargar_topologia()
+    geojson_data = cargar_geojson() if topologia is None else None
+    almacen, info_regiones = Datos.almacen(), cargar_informacion_regiones()
+    with Perfil.tramo("construccion", "mapa unificado"):
+        return create_map_unificado(geojson_data, almacen, info_regiones, topologia).getvalue()
+
+def render_map(unificado=True):
+    if unificado:                       # Una sola capa, cambio de año en el navegador
+        mapa_html = mapa_unificado_html()
+        Perfil.carga_util("mapa", mapa_html)
+        st.components.v1.html(mapa_html, height=600)
+        return
+
     # Cargar información de regiones
     info_regiones = cargar_informacion_regiones()
     
-    mapa = json.load(open("Other/peru_departamental_simple.geojson", "r"))
-    gastos = pd.read_csv("Gasto-Anual/Gasto-Anual-2012-2023.csv")
+    mapa = cargar_geojson()
+    gastos = Datos.almacen().tabla_anual
 
     map_html = create_map(mapa, gastos, info_regiones, selected_departamento=None)
+    Perfil.carga_util("mapa", map_html.getvalue())
     st.components.v1.html(map_html.getvalue(), height=600)
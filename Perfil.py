@@ -0,0 +1,155 @@
+import os
+import json
+import time
+import cProfile
+import threading
+import contextlib
+import collections
+import streamlit as st
+
+ETAPAS = ["carga", "transformacion", "construccion", "serializacion"]
+RUTA_LOG = "perfil.jsonl"               # Una línea JSON por ejecución del script (rerun)
+DIRECTORIO_CPROFILE = "perfiles"        # Un archivo .prof por rerun, para abrir con pstats o snakeviz
+MODOS = {"barra", "log", "cprofile"}
+
+_local = threading.local()              # Streamlit ejecuta cada sesión en su propio hilo
+_candado = threading.Lock()
+
+
+class RegistroDeRerun:
+    """Tramos de tiempo, bytes enviados al navegador y contadores de una ejecución del script"""
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.fecha = time.strftime("%Y-%m-%dT%H:%M:%S")
+        self.total_ms = None
+        self.detalles = {}                                          # Página, comparativo, etc.
+        self.tramos = []                                            # En el orden en que terminan
+        self.bytes = collections.Counter()
+        self.contadores = collections.Counter()
+        self._pila = []                                             # Tiempo de los tramos hijos de cada abierto
+
+    def etapas(self):                   # Milisegundos propios por etapa (sin contar los tramos anidados)
+        totales = dict.fromkeys(ETAPAS, 0.0)
+        for tramo in self.tramos:
+            totales[tramo["etapa"]] += tramo["propio_ms"]
+        return {etapa: round(ms, 3) for etapa, ms in totales.items()}
+
+    def como_dict(self):
+        return {"fecha": self.fecha, **self.detalles, "total_ms": self.total_ms, "etapas": self.etapas(),
+                "tramos": self.tramos, "bytes": dict(self.bytes), "contadores": dict(self.contadores)}
+
+
+def actual():                           # Registro del rerun en curso en este hilo; None si no se mide
+    return getattr(_local, "registro", None)
+
+
+def modos():
+    """Salidas activas: variable de entorno PERFIL (barra, log y cprofile separados por comas).
+    ?perfil en la URL solo activa la barra lateral de esa sesión."""
+    activos = {modo.strip() for modo in os.environ.get("PERFIL", "").split(",")} & MODOS
+    if "perfil" in st.query_params:
+        activos.add("barra")
+    return activos
+
+
+@contextlib.contextmanager
+def tramo(etapa, nombre):
+    """Medir un bloque: etapa es una de ETAPAS. Sin rerun en curso (consola, benchmark) no hace nada."""
+    registro = actual()
+    if registro is None:
+        yield
+        return
+    registro._pila.append(0.0)
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        ms = (time.perf_counter() - inicio) * 1000
+        hijos = registro._pila.pop()
+        if registro._pila:
+            registro._pila[-1] += ms
+        registro.tramos.append({"etapa": etapa, "nombre": nombre, "ms": round(ms, 3),
+                                "propio_ms": round(ms - hijos, 3), "nivel": len(registro._pila)})
+
+
+def carga_util(nombre, contenido):      # Bytes de HTML, JSON o CSS enviados al navegador
+    registro = actual()
+    if registro is not None and contenido:
+        registro.bytes[nombre] += len(contenido) if isinstance(contenido, bytes) else len(contenido.encode("utf-8"))
+
+
+def contar(nombre, cantidad=1):         # Aciertos y fallos de caché, u otros eventos del rerun
+    registro = actual()
+    if registro is not None:
+        registro.contadores[nombre] += cantidad
+
+
+def anotar(**detalles):                 # Página y selección, para identificar el rerun en el log
+    registro = actual()
+    if registro is not None:
+        registro.detalles.update(detalles)
+
+
+def _guardar_log(registro, ruta=RUTA_LOG):
+    linea = json.dumps(registro.como_dict(), ensure_ascii=False)
+    with _candado, open(ruta, "a", encoding="utf-8") as archivo:  # Varias sesiones escriben a la vez
+        archivo.write(linea + "\n")
+
+
+def _iniciar_cprofile():                # None si ya hay otro perfilador activo (Python 3.12+ admite uno solo)
+    perfilador = cProfile.Profile()
+    try:
+        perfilador.enable()
+    except ValueError:
+        return None
+    return perfilador
+
+
+@contextlib.contextmanager
+def rerun():
+    """Medir una ejecución completa del script; devuelve el registro, o None si no hay ningún modo activo"""
+    activos = modos()
+    if not activos:
+        yield None
+        return
+
+    registro = _local.registro = RegistroDeRerun()
+    perfilador = _iniciar_cprofile() if "cprofile" in activos else None
+    try:
+        yield registro
+    finally:
+        if perfilador is not None:
+            perfilador.disable()
+        registro.total_ms = round((time.perf_counter() - registro.inicio) * 1000, 3)
+        _local.registro = None
+
+        if "log" in activos:
+            _guardar_log(registro)
+        if perfilador is not None:
+            os.makedirs(DIRECTORIO_CPROFILE, exist_ok=True)
+            nombre = registro.fecha.replace(":", "") + f"-{threading.get_ident()}-{time.perf_counter_ns()}.prof"
+            perfilador.dump_stats(os.path.join(DIRECTORIO_CPROFILE, nombre))
+        if "barra" in activos:
+            mostrar_barra(registro)
+
+
+def mostrar_barra(registro):
+    """Barra lateral de depuración con el último rerun de la sesión"""
+    import pandas as pd                 # Solo con la barra activa: la página de información no carga pandas
+
+    with st.sidebar:
+        st.subheader("Perfil del último rerun")
+        st.metric("Total", f"{registro.total_ms:,.1f} ms")
+        st.caption(" · ".join(f"{clave}: {valor}" for clave, valor in registro.detalles.items()))
+        st.dataframe(pd.DataFrame({"Etapa": list(registro.etapas()), "ms": list(registro.etapas().values())}),
+                     hide_index=True, use_container_width=True)
+        if registro.tramos:
+            st.dataframe(pd.DataFrame(registro.tramos), hide_index=True, use_container_width=True)
+        if registro.bytes:
+            st.dataframe(pd.DataFrame({"Contenido": list(registro.bytes), "Bytes": list(registro.bytes.values())}),
+                         hide_index=True, use_container_width=True)
+        if registro.contadores:
+            st.dataframe(pd.DataFrame({"Contador": list(registro.contadores),
+                                       "Cantidad": list(registro.contadores.values())}),
+                         hide_index=True, use_container_width=True)
@@ -0,0 +1,14 @@
+import Cache
+
+
+def test_limpiar_solo_borra_versiones_anteriores(tmp_path):
+    for nombre in ("otra_carpeta", ".git", "0123456789abcdef-0123456789abcdef"):
+        (tmp_path / nombre).mkdir()
+    (tmp_path / "archivo.txt").write_text("")
+    (tmp_path / "fedcba9876543210-fedcba9876543210").write_text("")   # Archivo con nombre de versión
+
+    cache = Cache.CacheRenderizado("aaaaaaaaaaaaaaaa-bbbbbbbbbbbbbbbb", str(tmp_path))
+    cache.obtener(("anual", 2012), lambda: {"tabla": "<table></table>"})
+    cache.limpiar_versiones_anteriores()
+    assert sorted(ruta.name for ruta in tmp_path.iterdir()) == [
+        ".git", "aaaaaaaaaaaaaaaa-bbbbbbbbbbbbbbbb", "archivo.txt", "fedcba9876543210-fedcba9876543210", "otra_carpeta"]
@@ -0,0 +1,31 @@
+import shutil
+import pytest
+import Comprimido
+
+solo_programa_zstd = pytest.mark.skipif(Comprimido.zstandard is not None or shutil.which("zstd") is None,
+                                        reason="Prueba el respaldo con el programa zstd")
+
+
+@solo_programa_zstd
+def test_zst_truncado_no_se_lee_como_un_csv_mas_corto(tmp_path):
+    original = b"".join(b"%d,LIMA,%d.25\n" % (fila, fila) for fila in range(200000))
+    (tmp_path / "2012-Gastos.csv").write_bytes(original)
+    ruta = Comprimido.comprimir(str(tmp_path / "2012-Gastos.csv"), "zstd")
+    with Comprimido.abrir(ruta) as flujo:
+        assert flujo.read() == original
+
+    comprimido = (tmp_path / "2012-Gastos.csv.zst").read_bytes()
+    (tmp_path / "2012-Gastos.csv.zst").write_bytes(comprimido[:len(comprimido) // 2])
+    with pytest.raises(RuntimeError, match="código"), Comprimido.abrir(ruta) as flujo:
+        flujo.read()
+
+
+@pytest.mark.skipif(Comprimido.zstandard is not None or shutil.which("false") is None,
+                    reason="Prueba el respaldo con el programa zstd")
+def test_error_del_programa_zstd_al_comprimir(tmp_path, monkeypatch):
+    monkeypatch.setattr(Comprimido, "_programa_zstd", lambda: "false")   # Sale con código 1
+    compresor = Comprimido.CompresorEnHilo(str(tmp_path / "2012-Gastos.csv.zst"), "zstd")
+    compresor(b"ANO_EJE\n2012\n")
+    with pytest.raises((RuntimeError, BrokenPipeError)):
+        compresor.cerrar()
+    assert not list(tmp_path.iterdir())                             # Ni el .zst ni el .tmp a medias
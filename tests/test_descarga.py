@@ -0,0 +1,73 @@
+import shutil
+import threading
+import pytest
+import Comprimido
+import Descarga
+import Ingesta
+from test_ingesta import _escribir_csv
+
+
+@pytest.fixture
+def servidor(tmp_path):                 # Servidor local con Range; devuelve (carpeta servida, url base)
+    carpeta = tmp_path / "servidor"
+    carpeta.mkdir()
+    servidor = Descarga.servir(str(carpeta), 0)
+    hilo = threading.Thread(target=servidor.serve_forever, daemon=True)
+    hilo.start()
+    yield carpeta, f"http://127.0.0.1:{servidor.server_address[1]}/"
+    servidor.shutdown()
+    servidor.server_close()
+
+
+@pytest.mark.parametrize("parte", [1 / 3, 1], ids=["a-medias", "completo-416"])
+def test_descarga_continua_un_part_y_agrega_todo(servidor, tmp_path, parte):
+    carpeta, url = servidor
+    exactos = _escribir_csv(str(carpeta / "2012-Gastos.csv"))
+    original = (carpeta / "2012-Gastos.csv").read_bytes()
+    destino = tmp_path / "2012-Gastos.csv"
+    (tmp_path / "2012-Gastos.csv.part").write_bytes(original[:int(len(original) * parte)])  # Corta una línea
+
+    agregador = Descarga.AgregadorEnFlujo(bytes_por_parte=50000)   # Varias partes durante la descarga
+    assert Descarga.descargar(url + "2012-Gastos.csv", str(destino), agregador, bloque=16 * 1024) == str(destino)
+    assert destino.read_bytes() == original
+    assert not (tmp_path / "2012-Gastos.csv.part").exists()
+    assert Ingesta.verificar_totales(agregador.finalizar()).to_dict() == exactos
+
+
+class _Corte:                           # Consumidor que simula una conexión caída tras cierta cantidad de bytes
+    def __init__(self, limite):
+        self.limite, self.recibidos = limite, bytearray()
+
+    def __call__(self, datos):
+        self.recibidos += datos
+        if len(self.recibidos) > self.limite:
+            raise ConnectionResetError("corte simulado")
+
+
+@pytest.mark.parametrize("tipo", [
+    "gzip", pytest.param("zstd", marks=pytest.mark.skipif(
+        Comprimido.zstandard is None and shutil.which("zstd") is None, reason="Sin zstandard ni programa zstd"))])
+def test_descarga_comprimida_continua_desde_el_corte(servidor, tmp_path, tipo):
+    carpeta, url = servidor
+    original = b"ANO_EJE,MONTO_DEVENGADO\n" + b"".join(b"2012,%d.25\n" % fila for fila in range(100000))
+    (carpeta / "2012-Gastos.csv").write_bytes(original)
+    destino = str(tmp_path / "2012-Gastos.csv")
+    comprimido = destino + Comprimido.EXTENSION[tipo]
+
+    corte = _Corte(300000)
+    compresor = Comprimido.CompresorEnHilo(comprimido, tipo, continuar=True)
+    with pytest.raises(ConnectionResetError):
+        Descarga.descargar(url + "2012-Gastos.csv", destino, corte, bloque=64 * 1024, compresor=compresor)
+    guardados = compresor.bytes
+    assert 0 < guardados < len(original)
+
+    todo = bytearray()
+    compresor = Comprimido.CompresorEnHilo(comprimido, tipo, continuar=True)
+    assert compresor.bytes == guardados                             # Se retoma, no se empieza de nuevo
+    assert Descarga.descargar(url + "2012-Gastos.csv", destino, todo.extend, bloque=64 * 1024,
+                              compresor=compresor) == comprimido
+    assert bytes(todo) == original                                  # El consumidor recibe también lo previo
+    with Comprimido.abrir(comprimido) as flujo:
+        assert flujo.read() == original
+    assert sorted(ruta.name for ruta in tmp_path.iterdir()) == ["2012-Gastos.csv" + Comprimido.EXTENSION[tipo],
+                                                                "servidor"]
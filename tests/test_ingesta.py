@@ -0,0 +1,159 @@
+import os
+import re
+import numpy as np
+import pandas as pd
+import pytest
+import Ingesta
+import Columnar
+
+DEPARTAMENTOS = ["AMAZONAS", "CUSCO", "LIMA", "PROVINCIA CONSTITUCIONAL DEL CALLAO"]
+
+
+def _texto(centimos):                   # Céntimos enteros → "61281728.95", sin pasar por float
+    return f"{centimos // 100}.{centimos % 100:02d}"
+
+
+def _escribir_csv(ruta, filas=4000, semilla=0):
+    """<año>-Gastos.csv pequeño con las columnas que leen Ingesta y Columnar. Devuelve los céntimos
+    exactos del devengado por (departamento, mes), calculados con enteros de Python."""
+    rng = np.random.default_rng(semilla)
+    mes = rng.integers(0, 13, filas)
+    devengado = rng.integers(0, 10 ** 10, filas)
+    devengado[mes == 0] = 0                                         # La apertura solo tiene PIA y PIM
+    devengado[:3] = 6128172895                                      # 61281728.95, el residuo del README
+    tabla = pd.DataFrame({
+        "ANO_EJE": 2012,
+        "MES_EJE": mes,
+        "NIVEL_GOBIERNO_NOMBRE": np.array(["GOBIERNO NACIONAL", "GOBIERNOS LOCALES"])[rng.integers(0, 2, filas)],
+        "SECTOR_NOMBRE": np.array([f"SECTOR {k}" for k in range(5)])[rng.integers(0, 5, filas)],
+        "DEPARTAMENTO_EJECUTORA_NOMBRE": np.array(DEPARTAMENTOS)[rng.integers(0, len(DEPARTAMENTOS), filas)],
+        "FUNCION_NOMBRE": np.array([f"FUNCION {k}" for k in range(4)])[rng.integers(0, 4, filas)],
+        "MONTO_PIA": [_texto(int(c)) for c in rng.integers(0, 10 ** 10, filas)],
+        "MONTO_PIM": [_texto(int(c)) for c in rng.integers(0, 10 ** 10, filas)],
+        "MONTO_DEVENGADO": [_texto(int(c)) for c in devengado],
+    })
+    tabla.to_csv(ruta, index=False)
+
+    exactos = {}
+    for departamento, mes_eje, centimos in zip(tabla["DEPARTAMENTO_EJECUTORA_NOMBRE"], mes, devengado):
+        clave = (departamento, int(mes_eje))
+        exactos[clave] = exactos.get(clave, 0) + int(centimos)
+    return exactos
+
+
+def _parciales(ruta, destino):          # La misma suma por los tres caminos: secuencial, paralelo y columnar
+    cabecera, rangos = Ingesta.rangos_de_bytes(ruta, 4)
+    return {"secuencial": Ingesta.agregar_archivo(ruta, chunksize=500, verbose=False),
+            "paralelo": Ingesta.reducir_parciales([Ingesta.agregar_rango(ruta, inicio, fin, cabecera, 300)
+                                                   for inicio, fin in rangos]),
+            "columnar": Columnar.agregar(Columnar.convertir(ruta, destino))}
+
+
+def test_sumas_exactas_e_iguales_por_todos_los_caminos(tmp_path):
+    ruta = str(tmp_path / "2012-Gastos.csv")
+    exactos = _escribir_csv(ruta)
+    flotante = pd.read_csv(ruta).groupby(["DEPARTAMENTO_EJECUTORA_NOMBRE", "MES_EJE"])["MONTO_DEVENGADO"].sum()
+    assert any(round(monto * 100) != monto * 100 for monto in flotante), "float64 debería desviarse"
+
+    parciales = _parciales(ruta, str(tmp_path / "2012-Gastos.col"))
+    for nombre, parcial in parciales.items():
+        assert parcial.dtype == "int64", nombre
+        assert parcial.to_dict() == parciales["secuencial"].to_dict(), nombre
+        assert Ingesta.verificar_totales(parcial).to_dict() == exactos, nombre
+
+    (tmp_path / "anual").mkdir()
+    (tmp_path / "mensual").mkdir()
+    Ingesta.guardar_anio(2012, parciales["paralelo"], str(tmp_path / "anual"), str(tmp_path / "mensual"))
+    mensual = pd.read_csv(Ingesta.ruta_mensual(2012, str(tmp_path / "mensual")), dtype={"Monto": str})
+    anual = pd.read_csv(Ingesta.ruta_anual(2012, str(tmp_path / "anual")), dtype={"Gasto_Total": str})
+    for departamento, mes, monto in mensual.itertuples(index=False):
+        assert re.fullmatch(r"\d+(\.\d{1,2})?", monto), monto
+        assert round(float(monto) * 100) == exactos[(departamento, mes)]
+        assert monto == str(exactos[(departamento, mes)] / 100)
+    for departamento, monto in anual.itertuples(index=False):
+        total = sum(centimos for (nombre, _), centimos in exactos.items() if nombre == departamento)
+        assert re.fullmatch(r"\d+(\.\d{1,2})?", monto), monto
+        assert monto == str(total / 100)
+
+
+def test_devengado_en_la_apertura_detiene_la_ingesta(tmp_path):
+    ruta = str(tmp_path / "2012-Gastos.csv")
+    _escribir_csv(ruta)
+    tabla = pd.read_csv(ruta, dtype=str)
+    fila = tabla.index[tabla["MES_EJE"] == "0"][0]
+    tabla.loc[fila, "MONTO_DEVENGADO"] = "12.34"
+    tabla.to_csv(ruta, index=False)
+    departamento = tabla.loc[fila, "DEPARTAMENTO_EJECUTORA_NOMBRE"]
+
+    for nombre, parcial in _parciales(ruta, str(tmp_path / "2012-Gastos.col")).items():
+        with pytest.raises(ValueError, match=re.escape(f"{departamento} (+12.34)")):
+            Ingesta.guardar_anio(2012, parcial, str(tmp_path), str(tmp_path))
+    assert not list(tmp_path.glob("2012-Gasto-*.csv"))              # Nada escrito
+
+
+def test_cubo_secuencial_y_paralelo_iguales(tmp_path):
+    ruta = str(tmp_path / "2012-Gastos.csv")
+    _escribir_csv(ruta, filas=6000, semilla=1)
+    cabecera, rangos = Ingesta.rangos_de_bytes(ruta, 3)
+    secuencial = Ingesta.agregar_archivo(ruta, chunksize=700, verbose=False, cubo=True)
+    paralelo = Ingesta.reducir_parciales([Ingesta.agregar_rango(ruta, inicio, fin, cabecera, 400, cubo=True)
+                                          for inicio, fin in rangos])
+    pd.testing.assert_frame_equal(secuencial.sort_index(), paralelo.sort_index(), check_index_type=False)
+
+    salidas = {}
+    for trabajadores in (1, 2):
+        carpetas = {carpeta: str(tmp_path / f"{carpeta}-{trabajadores}") for carpeta in ("anual", "mensual", "cubo")}
+        for carpeta in carpetas.values():
+            os.mkdir(carpeta)
+        Ingesta.procesar_anios([2012], str(tmp_path), carpetas["anual"], carpetas["mensual"], chunksize=700,
+                               trabajadores=trabajadores, bytes_por_rango=100 * 1024, cubo=True,
+                               dir_cubo=carpetas["cubo"])
+        salidas[trabajadores] = (pd.read_csv(Ingesta.ruta_cubo(2012, carpetas["cubo"])),
+                                 pd.read_csv(Ingesta.ruta_mensual(2012, carpetas["mensual"])))
+    for secuencial, paralelo in zip(salidas[1], salidas[2]):
+        pd.testing.assert_frame_equal(secuencial, paralelo)
+
+
+class _MemoriaSimulada:                 # RSS de base + costo fijo + costo por fila de la parte en curso
+    def __init__(self, monkeypatch, base, fijo, por_fila):
+        self.base, self.fijo, self.por_fila, self.pico = base, fijo, por_fila, base
+        monkeypatch.setattr(Ingesta, "rss_actual", lambda: self.base)
+        monkeypatch.setattr(Ingesta, "rss_pico", lambda: self.pico)
+        monkeypatch.setattr(Ingesta, "reiniciar_pico", self.reiniciar)
+
+    def reiniciar(self):
+        self.pico = self.base
+        return True
+
+    def leer(self, ajuste):             # Cada parte cuesta 50 ms más 1 µs por fila: las grandes rinden más
+        ajuste.empezar()
+        filas = ajuste.filas
+        self.pico = self.base + self.fijo + self.por_fila * filas
+        return ajuste.siguiente(filas, 0.05 + filas / 1e6)
+
+
+@pytest.mark.parametrize("fijo, por_fila", [(31 * 2 ** 20, 50), (0, 1000)])
+def test_ajuste_de_chunk_no_queda_en_el_minimo(monkeypatch, fijo, por_fila):
+    memoria = _MemoriaSimulada(monkeypatch, 104 * 2 ** 20, fijo, por_fila)
+    ajuste = Ingesta.AjusteDeChunk(150 * 2 ** 20, 80000)
+    tamanos = [memoria.leer(ajuste) for _ in range(12)]
+    for filas in tamanos[-5:]:                                      # Estable y dentro del presupuesto
+        assert filas > Ingesta.CHUNK_MINIMO
+        assert memoria.base + memoria.fijo + memoria.por_fila * filas <= ajuste.max_rss * 0.9 or \
+            memoria.base + memoria.fijo + memoria.por_fila * Ingesta.CHUNK_MINIMO > ajuste.max_rss * 0.9
+    assert tamanos[-1] == tamanos[-2]
+
+
+def test_ajuste_de_chunk_vuelve_a_crecer_con_holgura(monkeypatch):
+    memoria = _MemoriaSimulada(monkeypatch, 60 * 2 ** 20, 0, 500)
+    ajuste = Ingesta.AjusteDeChunk(150 * 2 ** 20, 30000)
+    for _ in range(6):
+        memoria.leer(ajuste)
+    mejor = ajuste.filas
+    memoria.base = 125 * 2 ** 20                                    # Otra cosa ocupa memoria: reducir
+    memoria.leer(ajuste)
+    assert ajuste.filas < mejor
+    memoria.base = 40 * 2 ** 20                                     # Se libera: recuperar el tamaño
+    for _ in range(6):
+        memoria.leer(ajuste)
+    assert ajuste.filas >= mejor
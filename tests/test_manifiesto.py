@@ -0,0 +1,70 @@
+import pytest
+import Datos
+import Ingesta
+import Manifiesto
+from test_ingesta import _escribir_csv
+
+BYTES_POR_PUNTO = 50000                 # Varios rangos en un archivo de prueba de unas 6000 filas
+
+
+class _Contador:                        # Envuelve Ingesta.agregar_rango; con limite, se corta tras esa cantidad
+    def __init__(self, monkeypatch, limite=None):
+        self.agregar_rango, self.limite, self.fines = Ingesta.agregar_rango, limite, []
+        monkeypatch.setattr(Ingesta, "agregar_rango", self)
+
+    def __call__(self, ruta, inicio, fin, *args, **kwargs):
+        if self.limite is not None and len(self.fines) == self.limite:
+            raise KeyboardInterrupt("corte simulado")
+        self.fines.append(fin)
+        return self.agregar_rango(ruta, inicio, fin, *args, **kwargs)
+
+
+def _actualizar(tmp_path, anios, bytes_por_punto=BYTES_POR_PUNTO):
+    return Manifiesto.actualizar(anios, str(tmp_path), str(tmp_path / "anual"), str(tmp_path / "mensual"),
+                                 str(tmp_path / "manifiesto.json"), chunksize=500, bytes_por_punto=bytes_por_punto)
+
+
+def _fines(ruta, bytes_por_punto):      # Final de cada rango en que procesar_anio divide el archivo
+    _, rangos = Ingesta.rangos_de_bytes(ruta, Ingesta._partes_del_archivo(ruta, bytes_por_punto))
+    return [fin for _, fin in rangos]
+
+
+@pytest.mark.parametrize("bytes_al_continuar", [BYTES_POR_PUNTO, 2 * BYTES_POR_PUNTO])
+def test_interrumpir_y_continuar_un_anio(tmp_path, monkeypatch, bytes_al_continuar):
+    for carpeta in ("anual", "mensual"):
+        (tmp_path / carpeta).mkdir()
+    ruta = str(tmp_path / "2012-Gastos.csv")
+    exactos = _escribir_csv(ruta, filas=6000)
+    fines = _fines(ruta, BYTES_POR_PUNTO)
+    assert len(fines) > 3
+
+    with monkeypatch.context() as parche, pytest.raises(KeyboardInterrupt):
+        _Contador(parche, limite=2)
+        _actualizar(tmp_path, [2012])
+    registro = Manifiesto.cargar(str(tmp_path / "manifiesto.json"))["anios"]["2012"]
+    assert registro["estado"] == "en_proceso" and registro["offsets"] == fines[:2]
+
+    contador = _Contador(monkeypatch)
+    _actualizar(tmp_path, [2012], bytes_al_continuar)
+    if bytes_al_continuar == BYTES_POR_PUNTO:                       # Solo los rangos que faltaban
+        assert contador.fines == fines[2:]
+    else:                                                           # Otros rangos: se empieza de nuevo
+        assert contador.fines == _fines(ruta, bytes_al_continuar)
+    registro = Manifiesto.cargar(str(tmp_path / "manifiesto.json"))["anios"]["2012"]
+    assert registro["estado"] == "completo" and registro["offsets"] == _fines(ruta, bytes_al_continuar)
+    assert Ingesta.verificar_totales(Manifiesto._lista_a_parcial(registro["parcial"])).to_dict() == exactos
+
+
+def test_datos_lee_la_combinada_mas_reciente(tmp_path):
+    for carpeta in ("anual", "mensual"):
+        (tmp_path / carpeta).mkdir()
+    _escribir_csv(str(tmp_path / "2012-Gastos.csv"))
+    _actualizar(tmp_path, [2012])
+    _escribir_csv(str(tmp_path / "2013-Gastos.csv"), semilla=1)
+    _actualizar(tmp_path, [2012, 2013])                             # Un año nuevo: otro nombre de archivo
+
+    assert sorted(ruta.name for ruta in (tmp_path / "anual").glob("Gasto-Anual-*")) == [
+        "Gasto-Anual-2012-2012.csv", "Gasto-Anual-2012-2013.csv"]
+    assert Datos.ruta_anual(str(tmp_path / "anual")) == str(tmp_path / "anual" / "Gasto-Anual-2012-2013.csv")
+    almacen = Datos.cargar(Datos.ruta_anual(str(tmp_path / "anual")), str(tmp_path / "mensual"))
+    assert almacen.anios == [2012, 2013]